@@ -3,6 +3,12 @@ import { storage } from "../storage";
 import path from "path";
 import { redis } from "../services/redisMcp";
 
+// Longest stdout line kept waiting for its newline before it is processed as is
+const MAX_PARTIAL_LINE_LENGTH = 1024 * 1024;
+// Frames waiting to be stored before stdout is paused; reading resumes once
+// the backlog has drained to half of this
+const MAX_PENDING_FRAMES = 256;
+
 /**
  * Interface for Python agent runner
  */
@@ -27,6 +33,15 @@ export class PythonAgent implements IPythonAgent {
   process: ChildProcess | null = null;
   isRunning: boolean = false;
   
+  // Incomplete trailing line of stdout, kept until its newline arrives
+  private stdoutBuffer: string = "";
+  // Sequence number of the last frame received, to detect lost frames
+  private lastSeq: number = 0;
+  // Records are stored in the order they were emitted
+  private outputQueue: Promise<void> = Promise.resolve();
+  // Frames queued but not yet handled, bounded by pausing stdout
+  private pendingFrames: number = 0;
+  
   constructor(agentId: number, agentName: string, pythonScript: string) {
     this.agentId = agentId;
     this.agentName = agentName;
@@ -60,10 +75,16 @@ export class PythonAgent implements IPythonAgent {
         stdio: ['pipe', 'pipe', 'pipe'] 
       });
       
-      // Handle process output
-      this.process.stdout?.on('data', (data) => {
-        console.log(`[${this.agentName}] ${data.toString().trim()}`);
-        this.handleAgentOutput(data.toString());
+      this.stdoutBuffer = "";
+      this.lastSeq = 0;
+      this.pendingFrames = 0;
+      
+      // Handle process output; decode as UTF-8 so multi-byte characters
+      // split across chunks are reassembled
+      this.process.stdout?.setEncoding('utf8');
+      this.process.stdout?.on('data', (data: string) => {
+        console.log(`[${this.agentName}] ${data.trim()}`);
+        this.handleStdoutChunk(data);
       });
       
       this.process.stderr?.on('data', (data) => {
@@ -72,6 +93,11 @@ export class PythonAgent implements IPythonAgent {
       
       // Handle process exit
       this.process.on('close', (code) => {
+        // The last frame may not end with a newline
+        if (this.stdoutBuffer.trim()) {
+          this.enqueueFrame(this.stdoutBuffer);
+        }
+        this.stdoutBuffer = "";
         console.log(`Agent ${this.agentName} exited with code ${code}`);
         this.isRunning = false;
         this.updateAgentStatus('error');
@@ -161,7 +187,62 @@ export class PythonAgent implements IPythonAgent {
   }
   
   /**
-   * Handle agent output and potentially create logs/alerts
+   * Split stdout into newline-delimited frames. A chunk may hold several
+   * frames and a frame may span several chunks, so the trailing partial line
+   * is carried over to the next chunk.
+   */
+  private handleStdoutChunk(chunk: string): void {
+    const lines = (this.stdoutBuffer + chunk).split('\n');
+    this.stdoutBuffer = lines.pop() ?? "";
+    
+    // Guard against unbounded growth from output that never ends a line
+    if (this.stdoutBuffer.length > MAX_PARTIAL_LINE_LENGTH) {
+      lines.push(this.stdoutBuffer);
+      this.stdoutBuffer = "";
+    }
+    
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      this.enqueueFrame(line);
+    }
+  }
+  
+  /**
+   * Queue a frame behind the ones already received. Stdout is paused while
+   * MAX_PENDING_FRAMES frames are waiting, so a fast agent is held back by
+   * the pipe instead of growing the queue without bound.
+   */
+  private enqueueFrame(line: string): void {
+    const stdout = this.process?.stdout;
+    this.pendingFrames++;
+    this.outputQueue = this.outputQueue
+      .then(() => this.handleAgentOutput(line))
+      .finally(() => {
+        this.pendingFrames--;
+        if (stdout?.isPaused() && this.pendingFrames <= MAX_PENDING_FRAMES / 2) {
+          stdout.resume();
+        }
+      });
+    
+    if (this.pendingFrames >= MAX_PENDING_FRAMES && stdout && !stdout.isPaused()) {
+      stdout.pause();
+    }
+  }
+  
+  /**
+   * Check a frame's sequence number and warn about lost frames
+   */
+  private checkSequence(seq: unknown): void {
+    if (typeof seq !== 'number') return;
+    
+    if (this.lastSeq && seq > this.lastSeq + 1) {
+      console.warn(`[${this.agentName}] Lost ${seq - this.lastSeq - 1} output frame(s) before seq ${seq}`);
+    }
+    this.lastSeq = seq;
+  }
+  
+  /**
+   * Handle one line of agent output and potentially create logs/alerts
    */
   private async handleAgentOutput(output: string): Promise<void> {
     if (!output.trim()) return;
@@ -171,41 +252,20 @@ export class PythonAgent implements IPythonAgent {
       if (output.trim().startsWith('{')) {
         try {
           const data = JSON.parse(output);
+          this.checkSequence(data.seq);
           
-          // Handle log entry
-          if (data.type === 'log') {
-            await storage.createLog({
-              level: data.level || 'info',
-              message: data.message,
-              source: this.agentName,
-              timestamp: new Date(),
-              metadata: data.metadata || {}
-            });
-          }
-          
-          // Handle alert
-          else if (data.type === 'alert') {
-            await storage.createAlert({
-              severity: data.severity || 'medium',
-              title: data.title,
-              description: data.description,
-              source: this.agentName,
-              timestamp: new Date(),
-              status: 'new',
-              metadata: data.metadata || {}
-            });
-          }
-          
-          // Handle incident
-          else if (data.type === 'incident') {
-            await storage.createIncident({
-              incidentId: `INC-${Math.floor(1000 + Math.random() * 9000)}`,
-              type: data.incidentType,
-              status: 'open',
-              source: this.agentName,
-              timestamp: new Date(),
-              metadata: data.metadata || {}
-            });
+          // Handle a batch frame of several records
+          if (data.type === 'batch' && Array.isArray(data.records)) {
+            for (const record of data.records) {
+              // One failing record must not drop the rest of the batch
+              try {
+                await this.handleAgentRecord(record);
+              } catch (recordError) {
+                console.error(`[${this.agentName}] Error handling batch record:`, recordError);
+              }
+            }
+          } else {
+            await this.handleAgentRecord(data);
           }
         } catch (parseError) {
           console.error(`Error parsing agent output:`, parseError);
@@ -224,4 +284,45 @@ export class PythonAgent implements IPythonAgent {
       console.error(`Error handling agent output:`, error);
     }
   }
+  
+  /**
+   * Store a single log, alert or incident record
+   */
+  private async handleAgentRecord(data: any): Promise<void> {
+    // Handle log entry
+    if (data.type === 'log') {
+      await storage.createLog({
+        level: data.level || 'info',
+        message: data.message,
+        source: this.agentName,
+        timestamp: new Date(),
+        metadata: data.metadata || {}
+      });
+    }
+    
+    // Handle alert
+    else if (data.type === 'alert') {
+      await storage.createAlert({
+        severity: data.severity || 'medium',
+        title: data.title,
+        description: data.description,
+        source: this.agentName,
+        timestamp: new Date(),
+        status: 'new',
+        metadata: data.metadata || {}
+      });
+    }
+    
+    // Handle incident
+    else if (data.type === 'incident') {
+      await storage.createIncident({
+        incidentId: `INC-${Math.floor(1000 + Math.random() * 9000)}`,
+        type: data.incidentType,
+        status: 'open',
+        source: this.agentName,
+        timestamp: new Date(),
+        metadata: data.metadata || {}
+      });
+    }
+  }
 }
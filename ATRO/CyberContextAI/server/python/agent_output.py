@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Agent Output Protocol for ATRO-Lite
+
+Python agents report logs, alerts and incidents to the Node.js process on
+stdout. Every frame is one line of JSON (newline-delimited), stamped with a
+monotonically increasing "seq" so the reader can detect lost frames. Many
+records can travel in one batch frame:
+
+    {"type": "batch", "seq": 42, "records": [{...}, {...}]}
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+# Flush policy: whichever limit is reached first triggers a flush
+OUTPUT_BATCH_RECORDS = int(os.environ.get('AGENT_OUTPUT_BATCH_RECORDS', '64'))
+OUTPUT_MAX_BYTES = int(os.environ.get('AGENT_OUTPUT_MAX_BYTES', str(64 * 1024)))
+OUTPUT_MAX_LATENCY = float(os.environ.get('AGENT_OUTPUT_MAX_LATENCY', '0.2'))
+
+# Largest batch frame, kept well under the reader's 1 MB line limit; a
+# single record larger than this still travels alone in its own frame
+OUTPUT_MAX_FRAME_BYTES = int(os.environ.get('AGENT_OUTPUT_MAX_FRAME_BYTES', str(256 * 1024)))
+
+# Records that are flushed at once when their severity is critical
+URGENT_RECORD_TYPES = ("alert", "incident")
+
+# How often the writer reports its own statistics (0 disables)
+OUTPUT_STATS_INTERVAL = float(os.environ.get('AGENT_OUTPUT_STATS_INTERVAL', '60'))
+
+class RecordWriter:
+    """
+    Buffered, sequence-numbered NDJSON writer for agent records
+
+    Frames are collected in memory and written to the stream in one call per
+    flush, so a frame is never split by interleaved writes. The buffer is
+    flushed when it holds batch_records frames or max_bytes bytes, or when
+    its oldest frame has waited max_latency seconds, whichever comes first;
+    alerts and incidents of critical severity are flushed immediately (the
+    level of ordinary log records does not count). A background
+    thread enforces the latency bound and periodically reports the buffer
+    depth and flush latency it has observed.
+    """
+
+    def __init__(
+        self,
+        stream=None,
+        batch_records=OUTPUT_BATCH_RECORDS,
+        max_bytes=OUTPUT_MAX_BYTES,
+        max_latency=OUTPUT_MAX_LATENCY,
+        stats_interval=OUTPUT_STATS_INTERVAL,
+        max_frame_bytes=OUTPUT_MAX_FRAME_BYTES
+    ):
+        self.stream = stream or sys.stdout
+        self.batch_records = batch_records
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.stats_interval = stats_interval
+        self.max_frame_bytes = max_frame_bytes
+        self.seq = 0
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.oldest = None
+        # Re-entrant so a signal handler flushing at exit cannot deadlock
+        # against a write interrupted on the same thread
+        self.lock = threading.RLock()
+        self.pending = threading.Condition(self.lock)
+        self._reset_stats()
+        self.flushes = {"records": 0, "bytes": 0, "latency": 0, "critical": 0, "explicit": 0}
+        
+        atexit.register(self.flush)
+        self.flusher = threading.Thread(target=self._run_flusher, name="record-writer-flusher", daemon=True)
+        self.flusher.start()
+
+    def _reset_stats(self):
+        self.interval_frames = 0
+        self.max_depth = 0
+        self.max_depth_bytes = 0
+        self.flush_count = 0
+        self.total_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    def _append(self, frame_body, urgent=False):
+        # frame_body is the serialized frame without its closing brace
+        self.seq += 1
+        line = f'{frame_body}, "seq": {self.seq}}}\n'
+        if not self.buffer:
+            self.oldest = time.monotonic()
+            self.pending.notify()
+        self.buffer.append(line)
+        self.buffer_bytes += len(line)
+        self.interval_frames += 1
+        self.max_depth = max(self.max_depth, len(self.buffer))
+        self.max_depth_bytes = max(self.max_depth_bytes, self.buffer_bytes)
+        
+        if urgent:
+            self._flush_locked("critical")
+        elif len(self.buffer) >= self.batch_records:
+            self._flush_locked("records")
+        elif self.buffer_bytes >= self.max_bytes:
+            self._flush_locked("bytes")
+
+    def write(self, record):
+        """
+        Write one record as its own frame
+        """
+        body = json.dumps(record)
+        urgent = record.get("type") in URGENT_RECORD_TYPES and record.get("severity") == "critical"
+        with self.lock:
+            self._append(body[:-1], urgent)
+
+    def write_batch(self, records):
+        """
+        Write several records in one batch frame
+        """
+        self.write_serialized_batch([json.dumps(record) for record in records])
+
+    def write_serialized_batch(self, serialized_records):
+        """
+        Write already-serialized JSON records in batch frames of at most
+        max_frame_bytes each
+        """
+        frame = []
+        size = 0
+        with self.lock:
+            for record in serialized_records:
+                if frame and size + len(record) + 2 > self.max_frame_bytes:
+                    self._append_batch(frame)
+                    frame = []
+                    size = 0
+                frame.append(record)
+                size += len(record) + 2
+            if frame:
+                self._append_batch(frame)
+
+    def _append_batch(self, serialized_records):
+        self._append('{"type": "batch", "records": [' + ", ".join(serialized_records) + "]")
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked("explicit")
+
+    def _flush_locked(self, reason):
+        if not self.buffer:
+            return
+        latency = time.monotonic() - self.oldest
+        data = "".join(self.buffer)
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.oldest = None
+        
+        self.flushes[reason] += 1
+        self.flush_count += 1
+        self.total_flush_latency += latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        try:
+            self.stream.write(data)
+            self.stream.flush()
+        except (BrokenPipeError, ValueError):
+            # The reader went away or the stream is closed at shutdown
+            pass
+
+    def stats(self):
+        """
+        Buffer depth and flush latency observed since the last report
+        """
+        with self.lock:
+            return {
+                "buffered_frames": len(self.buffer),
+                "buffered_bytes": self.buffer_bytes,
+                "max_buffered_frames": self.max_depth,
+                "max_buffered_bytes": self.max_depth_bytes,
+                "frames_written": self.interval_frames,
+                "flushes": self.flush_count,
+                "avg_flush_latency_ms": round(1000 * self.total_flush_latency / self.flush_count, 3) if self.flush_count else 0,
+                "max_flush_latency_ms": round(1000 * self.max_flush_latency, 3),
+                "flush_reasons": dict(self.flushes)
+            }
+
+    def _report_stats(self):
+        stats = self.stats()
+        self._append(json.dumps({
+            "type": "log",
+            "level": "debug",
+            "message": f"Output writer: max depth {stats['max_buffered_frames']} frames, "
+                       f"max flush latency {stats['max_flush_latency_ms']} ms",
+            "metadata": stats
+        })[:-1])
+        # Reset after appending so the report itself is not counted
+        self._reset_stats()
+
+    def _run_flusher(self):
+        """
+        Background thread enforcing the latency bound and the stats interval
+        """
+        next_report = time.monotonic() + self.stats_interval if self.stats_interval > 0 else None
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                if next_report is not None and now >= next_report:
+                    # Only report intervals in which something was written
+                    if self.interval_frames:
+                        self._report_stats()
+                    next_report = now + self.stats_interval
+                    continue
+                
+                if self.buffer:
+                    due = self.oldest + self.max_latency
+                    if now >= due:
+                        self._flush_locked("latency")
+                        continue
+                    timeout = due - now
+                else:
+                    timeout = None
+                
+                if next_report is not None:
+                    timeout = next_report - now if timeout is None else min(timeout, next_report - now)
+                self.pending.wait(timeout)
@@ -7,20 +7,94 @@ In a production environment, this would integrate with actual log sources
 such as ELK stack, Splunk, or direct log files.
 """
 
+import argparse
+import asyncio
+import bz2
+import glob
+import gzip
 import json
+import lzma
+import mmap
+import multiprocessing
 import os
 import random
+import re
 import redis
 import signal
+import socket
 import sys
+import tempfile
 import time
+from collections import OrderedDict, deque
 from datetime import datetime
 
+from agent_output import RecordWriter
+from log_tail import CheckpointStore, FileTailer, udp_kernel_drops
+from mcp_writer import MCPWriter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # Configuration from environment
 AGENT_ID = os.environ.get('AGENT_ID', '0')
 AGENT_NAME = os.environ.get('AGENT_NAME', 'Log Parser')
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 
+# Follow mode: log files to tail, separated by commas or os.pathsep
+LOG_FILES = [
+    path.strip()
+    for path in os.environ.get('LOG_FILES', '').replace(os.pathsep, ',').split(',')
+    if path.strip()
+]
+LOG_FOLLOW_FROM_START = os.environ.get('LOG_FOLLOW_FROM_START', 'false').lower() == 'true'
+READ_BLOCK_SIZE = int(os.environ.get('LOG_READ_BLOCK_SIZE', str(1024 * 1024)))
+FOLLOW_IDLE_INTERVAL = float(os.environ.get('LOG_FOLLOW_IDLE_INTERVAL', '0.25'))
+
+# Read-offset checkpoints for followed files (set LOG_CHECKPOINT_FILE to "" to disable)
+LOG_CHECKPOINT_FILE = os.environ.get(
+    'LOG_CHECKPOINT_FILE',
+    os.path.join(tempfile.gettempdir(), f"atro-log-parser-{AGENT_ID}.checkpoints.json")
+)
+CHECKPOINT_INTERVAL = float(os.environ.get('LOG_CHECKPOINT_INTERVAL', '5'))
+
+# Batch mode: size of the byte ranges handed to each pool worker
+BATCH_CHUNK_SIZE = int(os.environ.get('LOG_BATCH_CHUNK_SIZE', str(8 * 1024 * 1024)))
+BATCH_FRAME_RECORDS = 1024
+
+# Alert deduplication: repeats within the window are folded into one alert (0 disables)
+ALERT_DEDUP_WINDOW = float(os.environ.get('ALERT_DEDUP_WINDOW', '300'))
+ALERT_DEDUP_MAX_ENTRIES = int(os.environ.get('ALERT_DEDUP_MAX_ENTRIES', '10000'))
+
+# Number of leading lines used to detect the format of a stream
+FORMAT_SNIFF_LINES = int(os.environ.get('LOG_FORMAT_SNIFF_LINES', '8'))
+# In follow mode a quiet stream is pinned from fewer lines after this many seconds
+FORMAT_SNIFF_TIMEOUT = float(os.environ.get('LOG_FORMAT_SNIFF_TIMEOUT', '5'))
+
+# Multi-line records: per-source start-of-record regexes as JSON, e.g.
+# {"app.log": "^\\d{4}-\\d{2}-\\d{2}"}; other sources use CONTINUATION_PATTERN
+MULTILINE_START_PATTERNS = {
+    source: re.compile(pattern)
+    for source, pattern in json.loads(os.environ.get('LOG_MULTILINE_PATTERNS', '{}')).items()
+}
+MULTILINE_FLUSH_TIMEOUT = float(os.environ.get('LOG_MULTILINE_FLUSH_TIMEOUT', '1.0'))
+MULTILINE_MAX_LINES = int(os.environ.get('LOG_MULTILINE_MAX_LINES', '500'))
+
+# Syslog receiver: listening ports are disabled unless configured
+SYSLOG_HOST = os.environ.get('SYSLOG_HOST', '0.0.0.0')
+SYSLOG_UDP_PORT = int(os.environ.get('SYSLOG_UDP_PORT', '0'))
+SYSLOG_TCP_PORT = int(os.environ.get('SYSLOG_TCP_PORT', '0'))
+SYSLOG_QUEUE_SIZE = int(os.environ.get('SYSLOG_QUEUE_SIZE', '100000'))
+SYSLOG_MAX_MESSAGE_SIZE = int(os.environ.get('SYSLOG_MAX_MESSAGE_SIZE', '65536'))
+SYSLOG_STATS_INTERVAL = float(os.environ.get('SYSLOG_STATS_INTERVAL', '60'))
+
+# Level keywords recognised in raw log lines
+LEVEL_PATTERN = re.compile(
+    r"\b(CRITICAL|FATAL|ERROR|WARNING|WARN|NOTICE|INFO|DEBUG|TRACE)\b",
+    re.IGNORECASE
+)
+
 # Sample log entries to simulate log parsing
 SAMPLE_LOG_ENTRIES = [
     {
@@ -73,6 +147,176 @@ SAMPLE_LOG_ENTRIES = [
     }
 ]
 
+# Keywords indicating potential security issues
+HIGH_RISK_KEYWORDS = [
+    "malware", "attack", "breach", "compromise", "exploit", "hack", 
+    "backdoor", "trojan", "virus", "ransomware", "spyware", "rootkit",
+    "command and control", "c2", "c&c", "reverse shell", "payload"
+]
+
+MEDIUM_RISK_KEYWORDS = [
+    "failed login", "authentication failure", "brute force", "injection",
+    "xss", "cross-site", "csrf", "unauthorized", "permission denied",
+    "suspicious", "anomaly", "unusual", "irregular"
+]
+
+HIGH_RISK_KEYWORD_SET = frozenset(HIGH_RISK_KEYWORDS)
+
+class KeywordMatcher:
+    """
+    Multi-keyword matcher built once at startup
+
+    The keywords are folded into a trie and compiled into a single regex
+    wrapped in a lookahead, so one left-to-right pass over the text reports
+    the longest keyword starting at every position, overlapping ones
+    included. Keywords that are a prefix of the longest match at the same
+    position are added from a precomputed table. Keeping the automaton
+    inside the regex engine scans the text in C, which a pure-Python
+    Aho-Corasick walk cannot match.
+    """
+    
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.pattern = re.compile("(?=(" + self._trie_pattern(self.keywords) + "))")
+        # keyword -> shorter keywords it starts with
+        self.prefixes = {
+            keyword: [other for other in self.keywords if other != keyword and keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+    
+    @staticmethod
+    def _trie_pattern(keywords):
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        
+        def build(node):
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ""
+            body = "(?:" + "|".join(branches) + ")" if len(branches) > 1 or "" in node else branches[0]
+            # A keyword ending here may be extended by a longer one
+            return body + "?" if "" in node else body
+        
+        return build(trie)
+    
+    def find(self, text):
+        """
+        Return the distinct keywords found in text, in order of first occurrence
+        """
+        found = {}
+        for keyword in self.pattern.findall(text):
+            found[keyword] = None
+            for prefix in self.prefixes[keyword]:
+                found[prefix] = None
+        return list(found)
+
+RISK_KEYWORD_MATCHER = KeywordMatcher(HIGH_RISK_KEYWORDS + MEDIUM_RISK_KEYWORDS)
+
+# Raw-bytes form of the keywords, used to skip lines without decoding them
+RISK_PREFILTER_KEYWORDS = [keyword.encode() for keyword in RISK_KEYWORD_MATCHER.keywords]
+MMAP_SCAN_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Structured field extraction, compiled once. Each field lists its patterns
+# in priority order; the first capturing group that matches wins.
+IPV4_PATTERN = r"(?<![\d.])((?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d))(?![\d.])"
+
+DEFAULT_FIELD_PATTERNS = {
+    "src_ip": [
+        r"\bfrom(?: IP| host)?[\s:=]+" + IPV4_PATTERN,
+        r"\b(?:src|source|client|rhost)(?:_?ip)?[\s:=]+" + IPV4_PATTERN
+    ],
+    # An address the message does not label as the source
+    "ip": [
+        IPV4_PATTERN
+    ],
+    "user": [
+        r"""\buser(?:name)?[\s:=]+['"]?([\w.@\\-]+)""",
+        r"\bfor (?:invalid user )?([\w.@-]+) from\b"
+    ],
+    "domain": [
+        r"(?<![\w/.@-])((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z][a-z0-9-]{1,62})(?![\w/-])"
+    ],
+    "port": [
+        r"\b(?:dst_?|dest_?|src_?)?port[\s:=]+(\d{1,5})\b",
+        r"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}:(\d{1,5})\b",
+        r"/dev/(?:tcp|udp)/[^/\s]+/(\d{1,5})\b"
+    ],
+    "file_path": [
+        r"(?<![\w/.:~-])(/(?:[\w.@+-]+/)*[\w.@+-]+)"
+    ]
+}
+
+# Extra patterns tried before the defaults for matching sources
+SOURCE_FIELD_PATTERNS = {
+    "auth": {
+        "user": [r"\b(?:Failed|Accepted) \w+ for (?:invalid user )?([\w.@-]+) from\b"]
+    },
+    "sshd": {
+        "user": [r"\b(?:Failed|Accepted) \w+ for (?:invalid user )?([\w.@-]+) from\b"]
+    },
+    "dns": {
+        "domain": [r"\b(?:query|domain)(?: to [\w ]+?)?[\s:=]+((?:[a-z0-9-]+\.)+[a-z][a-z0-9-]+)"]
+    }
+}
+
+# Dotted names that are file names rather than domains
+FILE_EXTENSIONS = frozenset([
+    "log", "txt", "py", "elf", "exe", "dll", "so", "sh", "bin", "html", "htm",
+    "php", "js", "json", "xml", "conf", "cfg", "ini", "gz", "zip", "tar", "jar"
+])
+
+class FieldExtractor:
+    """
+    Precompiled field extraction for one source
+    """
+    
+    def __init__(self, field_patterns):
+        self.fields = [
+            (field, [re.compile(pattern, re.IGNORECASE) for pattern in patterns])
+            for field, patterns in field_patterns.items()
+        ]
+    
+    def extract(self, message):
+        """
+        Return the structured fields found in message
+        """
+        found = {}
+        for field, patterns in self.fields:
+            for pattern in patterns:
+                match = pattern.search(message)
+                if not match:
+                    continue
+                value = match.group(1)
+                if field == "domain" and value.rsplit(".", 1)[-1].lower() in FILE_EXTENSIONS:
+                    continue
+                if field == "ip" and value == found.get("src_ip"):
+                    break
+                found[field] = int(value) if field == "port" else value
+                break
+        return found
+
+# Extractors cached per source, built on first use
+_field_extractors = {}
+
+def get_field_extractor(source):
+    """
+    Return the cached field extractor for a log source
+    """
+    extractor = _field_extractors.get(source)
+    if extractor is None:
+        field_patterns = {field: list(patterns) for field, patterns in DEFAULT_FIELD_PATTERNS.items()}
+        source_key = source.lower()
+        for name, overrides in SOURCE_FIELD_PATTERNS.items():
+            if name in source_key:
+                for field, patterns in overrides.items():
+                    field_patterns[field] = patterns + field_patterns[field]
+        extractor = _field_extractors[source] = FieldExtractor(field_patterns)
+    return extractor
+
 # Connect to Redis for MCP
 try:
     redis_client = redis.Redis.from_url(REDIS_URL)
@@ -82,8 +326,19 @@ except Exception as e:
     print(f"Error connecting to Redis: {e}")
     redis_client = None
 
+# Batched SET+PUBLISH of shared context
+mcp_writer = MCPWriter(redis_client) if redis_client else None
+
+# Sequence-numbered NDJSON output to the Node.js process
+output_writer = RecordWriter()
+
+# Checkpoint store of the running follow loop, flushed on shutdown
+active_checkpoints = None
+
 # Signal handlers for graceful shutdown
 def handle_signal(signum, frame):
+    if active_checkpoints:
+        active_checkpoints.flush()
     print(f"Received signal {signum}, shutting down...")
     sys.exit(0)
 
@@ -106,128 +361,1235 @@ def normalize_log_level(level):
     else:
         return "info"
 
-def log_event(level, message, metadata=None):
+def make_log_record(level, message, metadata=None):
     """
-    Log an event to stdout in JSON format for the Node.js process to capture
+    Build a log record in the format the Node.js process expects
     """
-    log_data = {
+    return {
         "type": "log",
         "level": level,
         "message": message,
         "metadata": metadata or {}
     }
-    print(json.dumps(log_data))
+
+def log_event(level, message, metadata=None):
+    """
+    Log an event to stdout in JSON format for the Node.js process to capture
+    """
+    output_writer.write(make_log_record(level, message, metadata))
 
 def assess_security_implication(log_entry):
     """
     Simple assessment of security implications
     In a real implementation, this would use more sophisticated analysis
+
+    Returns the risk level and the risk keywords found in the message.
     """
-    message = log_entry["message"].lower()
+    matched = RISK_KEYWORD_MATCHER.find(log_entry["message"].lower())
     
-    # Keywords indicating potential security issues
-    high_risk_keywords = [
-        "malware", "attack", "breach", "compromise", "exploit", "hack", 
-        "backdoor", "trojan", "virus", "ransomware", "spyware", "rootkit",
-        "command and control", "c2", "c&c", "reverse shell", "payload"
-    ]
+    # Check for high risk indicators, then medium risk indicators
+    if any(keyword in HIGH_RISK_KEYWORD_SET for keyword in matched):
+        return "high", matched
+    if matched:
+        return "medium", matched
     
-    medium_risk_keywords = [
-        "failed login", "authentication failure", "brute force", "injection",
-        "xss", "cross-site", "csrf", "unauthorized", "permission denied",
-        "suspicious", "anomaly", "unusual", "irregular"
-    ]
+    # Default to low
+    return "low", matched
+
+def build_alert_records(log_entry, risk_level):
+    """
+    Build the alert record, plus an incident record for high severities,
+    for a log entry. Returns the severity and the list of records.
+    """
+    if risk_level not in ["medium", "high"]:
+        return None, []
     
-    # Check for high risk indicators
-    for keyword in high_risk_keywords:
-        if keyword in message:
-            return "high"
+    severity = "medium" if risk_level == "medium" else "high"
     
-    # Check for medium risk indicators
-    for keyword in medium_risk_keywords:
-        if keyword in message:
-            return "medium"
+    # Increase severity for critical logs
+    if log_entry["level"] == "CRITICAL":
+        severity = "critical"
     
-    # Default to low
-    return "low"
+    records = [{
+        "type": "alert",
+        "severity": severity,
+        "title": f"Log Alert: {log_entry['source']}",
+        "description": log_entry["message"],
+        "metadata": log_entry
+    }]
+    
+    # For high severity alerts, create an incident
+    if severity == "high" or severity == "critical":
+        records.append({
+            "type": "incident",
+            "incidentType": log_entry["details"],
+            "metadata": {
+                "log": log_entry,
+                "risk_level": risk_level
+            }
+        })
+    
+    return severity, records
+
+# Volatile message parts (counters, pids, timestamps) ignored when fingerprinting
+FINGERPRINT_VOLATILE_PATTERN = re.compile(r"0x[0-9a-f]+|\d+")
+
+def alert_fingerprint(log_entry, severity):
+    """
+    Fingerprint an alert so repeats of the same event collapse together,
+    keeping the extracted entities so different attackers stay distinct
+    """
+    message = FINGERPRINT_VOLATILE_PATTERN.sub("#", log_entry["message"].lower())
+    return (
+        log_entry["source"], severity, " ".join(message.split()),
+        log_entry.get("src_ip") or log_entry.get("ip"), log_entry.get("user"), log_entry.get("domain")
+    )
+
+class AlertDeduplicator:
+    """
+    Bounded, time-windowed alert deduplication cache
+
+    The first alert for a fingerprint is emitted immediately and opens a
+    window; repeats inside the window are only counted. When the window
+    closes (TTL) or the fingerprint is evicted as least recently seen, one
+    summary alert carries the occurrence count and first/last-seen times.
+    """
+    
+    def __init__(self, window=ALERT_DEDUP_WINDOW, max_entries=ALERT_DEDUP_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        # fingerprint -> open window, in least-recently-seen order
+        self.entries = OrderedDict()
+        # (closes_at, fingerprint, opened_at) in opening order, for TTL expiry
+        self.expiry = deque()
+        self.suppressed = 0
+    
+    def admit(self, log_entry, risk_level, severity):
+        """
+        Return True if the alert should be emitted now, False if it repeats
+        an alert inside an open window
+        """
+        now = time.monotonic()
+        self.sweep(now)
+        
+        key = alert_fingerprint(log_entry, severity)
+        entry = self.entries.get(key)
+        if entry:
+            entry["count"] += 1
+            entry["last_seen"] = datetime.now().isoformat()
+            entry["log_entry"] = log_entry
+            self.entries.move_to_end(key)
+            self.suppressed += 1
+            return False
+        
+        self.entries[key] = {
+            "opened_at": now,
+            "count": 1,
+            "first_seen": log_entry.get("timestamp") or datetime.now().isoformat(),
+            "last_seen": log_entry.get("timestamp") or datetime.now().isoformat(),
+            "log_entry": log_entry,
+            "risk_level": risk_level
+        }
+        self.expiry.append((now + self.window, key, now))
+        
+        if len(self.entries) > self.max_entries:
+            _, evicted = self.entries.popitem(last=False)
+            self._close(evicted)
+        return True
+    
+    def sweep(self, now=None):
+        """
+        Close every window whose TTL has passed
+        """
+        now = time.monotonic() if now is None else now
+        expiry = self.expiry
+        while expiry and expiry[0][0] <= now:
+            _, key, opened_at = expiry.popleft()
+            entry = self.entries.get(key)
+            # Skip stale expiry records of windows already evicted or reopened
+            if entry and entry["opened_at"] == opened_at:
+                del self.entries[key]
+                self._close(entry)
+    
+    def _close(self, entry):
+        if entry["count"] > 1:
+            emit_alert_summary(entry)
+
+def share_alert_context(log_entry, risk_level, severity, extra=None):
+    """
+    Share alert context with MCP
+    """
+    if not mcp_writer:
+        return
+    context_data = {
+        "log": log_entry,
+        "risk_level": risk_level,
+        "severity": severity,
+        "keywords": log_entry.get("risk_keywords", []),
+        "timestamp": datetime.now().isoformat()
+    }
+    context_data.update(extra or {})
+    mcp_writer.share(f"mcp:context:log:{log_entry['source']}", "mcp:logs:alerts", context_data)
+
+def emit_alert_summary(entry):
+    """
+    Emit one alert summarizing the repeats folded into a dedup window
+    """
+    log_entry, risk_level = entry["log_entry"], entry["risk_level"]
+    severity, records = build_alert_records(log_entry, risk_level)
+    occurrences = {
+        "occurrences": entry["count"],
+        "first_seen": entry["first_seen"],
+        "last_seen": entry["last_seen"]
+    }
+    alert_record = records[0]
+    alert_record["title"] += f" (repeated {entry['count']} times)"
+    alert_record["metadata"] = dict(log_entry, **occurrences)
+    output_writer.write(alert_record)
+    share_alert_context(log_entry, risk_level, severity, occurrences)
+
+alert_dedup = AlertDeduplicator() if ALERT_DEDUP_WINDOW > 0 else None
 
 def create_alert(log_entry, risk_level):
     """
     Create an alert based on the log entry
+    Repeats of a recent alert are folded into a later summary alert
     """
-    if risk_level in ["medium", "high"]:
-        severity = "medium" if risk_level == "medium" else "high"
+    severity, records = build_alert_records(log_entry, risk_level)
+    if records:
+        if alert_dedup and not alert_dedup.admit(log_entry, risk_level, severity):
+            return
         
-        # Increase severity for critical logs
-        if log_entry["level"] == "CRITICAL":
-            severity = "critical"
+        for record in records:
+            output_writer.write(record)
         
-        alert_data = {
-            "type": "alert",
-            "severity": severity,
-            "title": f"Log Alert: {log_entry['source']}",
-            "description": log_entry["message"],
-            "metadata": log_entry
-        }
-        print(json.dumps(alert_data))
-        
-        # For high severity alerts, create an incident
-        if severity == "high" or severity == "critical":
-            incident_data = {
-                "type": "incident",
-                "incidentType": log_entry["details"],
-                "metadata": {
-                    "log": log_entry,
-                    "risk_level": risk_level
-                }
-            }
-            print(json.dumps(incident_data))
-            
         # Share context with MCP
-        if redis_client:
+        share_alert_context(log_entry, risk_level, severity)
+
+def entry_from_line(line, source):
+    """
+    Build a log entry from a raw log line
+    """
+    match = LEVEL_PATTERN.search(line)
+    return {
+        "level": match.group(1).upper() if match else "INFO",
+        "message": line,
+        "source": source,
+        "details": f"Log line from {source}"
+    }
+
+# Log decoders by format name, in detection priority order. Each entry holds a
+# sniff(line) predicate and a decode(line, source) function returning a log
+# entry, or None when the line does not parse.
+LOG_DECODERS = OrderedDict()
+
+def register_decoder(name, sniff):
+    """
+    Register a decoder for a log format
+    """
+    def register(decode):
+        LOG_DECODERS[name] = (sniff, decode)
+        return decode
+    return register
+
+def level_from_value(value, default="INFO"):
+    """
+    Map a level name or a numeric 0-10 severity to a level name
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        value = int(value)
+        if value >= 9:
+            return "CRITICAL"
+        if value >= 7:
+            return "ERROR"
+        if value >= 4:
+            return "WARNING"
+        return "INFO"
+    value = str(value).upper()
+    return {"ERR": "ERROR", "CRIT": "CRITICAL", "VERY-HIGH": "CRITICAL", "HIGH": "ERROR",
+            "MEDIUM": "WARNING", "LOW": "INFO", "INFORMATIONAL": "INFO"}.get(value, value)
+
+WINDOWS_EVENT_LEVELS = {1: "CRITICAL", 2: "ERROR", 3: "WARNING", 4: "INFO", 5: "DEBUG"}
+
+@register_decoder("windows_event", lambda line: line.startswith("{") and '"EventID"' in line)
+def decode_windows_event(line, source):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(event, dict):
+        return None
+    level = event.get("LevelDisplayName")
+    if not isinstance(level, str) or not level:
+        code = event.get("Level")
+        level = WINDOWS_EVENT_LEVELS.get(code, "INFO") if isinstance(code, int) else "INFO"
+    event_id = event.get("EventID")
+    entry = {
+        "level": level_from_value(level),
+        "message": str(event.get("Message") or f"Windows event {event_id}"),
+        "source": str(event.get("Channel") or event.get("ProviderName") or source),
+        "details": f"Windows event {event_id} from {event.get('Computer', 'unknown host')}",
+        "event_id": event_id
+    }
+    for field, key in (("user", "TargetUserName"), ("src_ip", "IpAddress")):
+        if isinstance(event.get(key), str) and event[key] not in ("", "-"):
+            entry[field] = event[key]
+    return entry
+
+@register_decoder("json", lambda line: line.startswith("{"))
+def decode_json(line, source):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    message = record.get("message") or record.get("msg") or record.get("log") or line
+    return {
+        "level": level_from_value(record.get("level") or record.get("severity") or record.get("lvl")),
+        "message": str(message),
+        "source": str(record.get("source") or record.get("logger") or record.get("service") or source),
+        "details": str(record.get("details") or f"JSON log from {source}")
+    }
+
+CEF_PATTERN = re.compile(r"CEF:(\d+)((?:\|(?:\\.|[^|\\])*){6})\|(.*)$")
+CEF_HEADER_FIELD = re.compile(r"\|((?:\\.|[^|\\])*)")
+CEF_HEADER_ESCAPE = re.compile(r"\\([|\\])")
+CEF_EXTENSION_PATTERN = re.compile(r"(\w+)=((?:\\.|[^\\])*?)(?=\s+\w+=|\s*$)")
+
+@register_decoder("cef", lambda line: "CEF:" in line)
+def decode_cef(line, source):
+    match = CEF_PATTERN.search(line)
+    if not match:
+        return None
+    header = [CEF_HEADER_ESCAPE.sub(r"\1", field) for field in CEF_HEADER_FIELD.findall(match.group(2))]
+    if len(header) != 6:
+        return None
+    vendor, product, _, signature, name, severity = header
+    extension = dict(CEF_EXTENSION_PATTERN.findall(match.group(3)))
+    message = name
+    if extension.get("msg"):
+        message = f"{message}: {extension['msg']}"
+    entry = {
+        "level": level_from_value(severity),
+        "message": message,
+        "source": f"{vendor} {product}".strip() or source,
+        "details": f"CEF event {signature}"
+    }
+    for field, key in (("src_ip", "src"), ("user", "suser"), ("domain", "dhost"), ("file_path", "filePath")):
+        if extension.get(key):
+            entry[field] = extension[key]
+    if extension.get("dpt", "").isdigit():
+        entry["port"] = int(extension["dpt"])
+    return entry
+
+@register_decoder("leef", lambda line: "LEEF:" in line)
+def decode_leef(line, source):
+    header = line[line.index("LEEF:"):]
+    parts = header.split("|", 5)
+    if len(parts) < 6:
+        return None
+    version, vendor, product, _, event_id, rest = parts
+    delimiter = "\t"
+    if version.startswith("LEEF:2") and "|" in rest:
+        # LEEF 2.0 names its attribute delimiter, possibly as a hex code
+        delimiter, rest = rest.split("|", 1)
+        code = delimiter.lower()
+        if code.startswith(("0x", "x")):
             try:
-                context_data = {
-                    "log": log_entry,
-                    "risk_level": risk_level,
-                    "severity": severity,
-                    "timestamp": datetime.now().isoformat()
-                }
-                redis_client.set(f"mcp:context:log:{log_entry['source']}", json.dumps(context_data))
-                redis_client.publish("mcp:logs:alerts", json.dumps(context_data))
-            except Exception as e:
-                print(f"Error sharing context with MCP: {e}")
+                delimiter = chr(int(code[2:] if code.startswith("0x") else code[1:], 16))
+            except (ValueError, OverflowError):
+                return None
+        delimiter = delimiter or "\t"
+    attributes = dict(
+        pair.split("=", 1) for pair in rest.split(delimiter) if "=" in pair
+    )
+    entry = {
+        "level": level_from_value(attributes.get("sev")),
+        "message": attributes.get("msg") or f"{product} event {event_id}",
+        "source": f"{vendor} {product}".strip() or source,
+        "details": f"LEEF event {event_id}"
+    }
+    for field, key in (("src_ip", "src"), ("user", "usrName"), ("domain", "dstHost")):
+        if attributes.get(key):
+            entry[field] = attributes[key]
+    if attributes.get("dstPort", "").isdigit():
+        entry["port"] = int(attributes["dstPort"])
+    return entry
 
-def parse_logs():
+@register_decoder("syslog", lambda line: SYSLOG_PRI_PATTERN.match(line.encode()) is not None)
+def decode_syslog(line, source):
+    return parse_syslog_message(line.encode())
+
+# Apache/nginx combined (and common) access log format
+COMBINED_LOG_PATTERN = re.compile(
+    r'(\S+) \S+ (\S+) \[([^\]]+)\] "(?:(\S+) (\S+)(?: [^"]*)?|[^"]*)" (\d{3}) (\S+)(?: "([^"]*)" "([^"]*)")?'
+)
+
+@register_decoder("combined", lambda line: COMBINED_LOG_PATTERN.match(line) is not None)
+def decode_combined(line, source):
+    match = COMBINED_LOG_PATTERN.match(line)
+    if not match:
+        return None
+    client, user, _, method, path, status = match.groups()[:6]
+    status = int(status)
+    entry = {
+        "level": "ERROR" if status >= 500 else "WARNING" if status >= 400 else "INFO",
+        "message": line,
+        "source": source,
+        "details": f"HTTP {method or 'request'} {status}",
+        "src_ip": client
+    }
+    if user != "-":
+        entry["user"] = user
+    if path:
+        entry["file_path"] = path
+    return entry
+
+LOG_DECODERS["text"] = (lambda line: True, entry_from_line)
+
+def detect_log_format(lines):
     """
-    Main function that simulates log parsing
+    Pick the decoder that recognises the most sample lines, falling back to
+    plain text unless at least half of the sample matches
     """
-    log_event("info", f"Log parsing started - Agent {AGENT_NAME} (ID: {AGENT_ID})")
+    best, best_count = "text", 0
+    for name, (sniff, _) in LOG_DECODERS.items():
+        if name == "text":
+            continue
+        count = sum(1 for line in lines if sniff(line))
+        if count > best_count:
+            best, best_count = name, count
+    return best if best_count * 2 >= len(lines) else "text"
+
+class StreamDecoder:
+    """
+    Decodes one log stream with a decoder pinned after sniffing its first
+    FORMAT_SNIFF_LINES lines, so detection is not repeated for every line
+    """
+    
+    def __init__(self, source):
+        self.source = source
+        self.format = None
+        self.decode = None
+        self.pending = []
+        self.pending_since = 0.0
+    
+    def _pin(self):
+        self.format = detect_log_format(self.pending)
+        self.decode = LOG_DECODERS[self.format][1]
+    
+    def _decode(self, line):
+        # Lines the pinned decoder cannot parse are kept as plain text
+        try:
+            entry = self.decode(line, self.source)
+        except (ValueError, TypeError, KeyError, AttributeError, IndexError):
+            entry = None
+        return entry or entry_from_line(line, self.source)
+    
+    def feed(self, line):
+        """
+        Return the log entries ready after adding a line
+        """
+        if self.decode:
+            return [self._decode(line)]
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append(line)
+        if len(self.pending) < FORMAT_SNIFF_LINES:
+            return []
+        return self.flush()
+    
+    def flush(self):
+        """
+        Pin a decoder from the lines seen so far and return their entries
+        """
+        if not self.pending:
+            return []
+        if not self.decode:
+            self._pin()
+        entries = [self._decode(line) for line in self.pending]
+        self.pending = []
+        return entries
+    
+    def flush_expired(self, now=None):
+        """
+        Pin a decoder from a sample that has not filled within the timeout
+        """
+        now = time.monotonic() if now is None else now
+        if self.pending and now - self.pending_since >= FORMAT_SNIFF_TIMEOUT:
+            return self.flush()
+        return []
+
+# Lines that continue the previous record: indented lines (stack frames,
+# wrapped text), traceback headers and the exception line closing a trace
+CONTINUATION_PATTERN = re.compile(
+    r"\s|Traceback \(most recent call last\)|Caused by:|"
+    r"During handling of the above exception|The above exception was the direct cause|"
+    r"\.\.\. \d+ (?:more|common frames omitted)|"
+    r"[A-Za-z_][\w.$]*(?:Error|Exception|Exit|Interrupt)\b(?::|$)"
+)
+
+def starts_record(line, start_pattern=None):
+    """
+    Whether a line starts a new logical record rather than continuing one
+    """
+    if start_pattern:
+        return start_pattern.match(line) is not None
+    return CONTINUATION_PATTERN.match(line) is None
+
+class MultilineAssembler:
+    """
+    Joins the lines of one stream into logical records (stack traces,
+    wrapped audit records), so each record is decoded and assessed once
+
+    A line starts a new record if it matches the source's start pattern, or,
+    without one, if it is not a continuation line. The pending record is
+    emitted when the next one starts, when it reaches MULTILINE_MAX_LINES,
+    or after MULTILINE_FLUSH_TIMEOUT seconds without a new line.
+    """
+    
+    def __init__(self, source):
+        self.start_pattern = MULTILINE_START_PATTERNS.get(source)
+        self.lines = []
+        self.pending_size = 0
+        self.updated = 0.0
+    
+    def feed(self, line, size=0):
+        """
+        Add a line; return the records it completes
+        """
+        is_start = starts_record(line, self.start_pattern)
+        
+        completed = []
+        if is_start or len(self.lines) >= MULTILINE_MAX_LINES:
+            completed = self.flush()
+        self.lines.append(line)
+        self.pending_size += size
+        self.updated = time.monotonic()
+        return completed
+    
+    def flush(self):
+        """
+        Return the pending record, if any
+        """
+        if not self.lines:
+            return []
+        record = "\n".join(self.lines)
+        self.lines = []
+        self.pending_size = 0
+        return [record]
+    
+    def flush_expired(self, now=None):
+        """
+        Return the pending record if no line has extended it for the timeout
+        """
+        now = time.monotonic() if now is None else now
+        if self.lines and now - self.updated >= MULTILINE_FLUSH_TIMEOUT:
+            return self.flush()
+        return []
+
+def decode_lines(lines, source, multiline=True):
+    """
+    Assemble raw log lines from one stream into records and decode them
+    into log entries
+
+    Without multiline, every line is decoded as a record of its own; lines
+    picked out by the prefilter are not contiguous, so joining them would
+    glue unrelated lines together.
+    """
+    assembler = MultilineAssembler(source) if multiline else None
+    decoder = StreamDecoder(source)
+    for line in lines:
+        text = line.decode("utf-8", "replace").rstrip("\r")
+        if not text.strip():
+            continue
+        if assembler is None:
+            yield from decoder.feed(text)
+            continue
+        for record in assembler.feed(text):
+            yield from decoder.feed(record)
+    if assembler is not None:
+        for record in assembler.flush():
+            yield from decoder.feed(record)
+    yield from decoder.flush()
+
+def classify_log_entry(log_entry):
+    """
+    Timestamp, normalize and assess a parsed log entry
+    Returns the log record for the entry and its risk level
+    """
+    # Add current timestamp
+    log_entry["timestamp"] = datetime.now().isoformat()
+    
+    # Normalize log level
+    normalized_level = normalize_log_level(log_entry["level"])
+    
+    record = make_log_record(
+        normalized_level, 
+        f"[{log_entry['source']}] {log_entry['message']}", 
+        {"source": log_entry["source"], "details": log_entry["details"]}
+    )
+    
+    # Assess security implications
+    risk_level, keywords = assess_security_implication(log_entry)
+    log_entry["risk_keywords"] = keywords
+    
+    # Extract structured fields (src_ip, ip, user, domain, port, file_path)
+    # only for entries that will raise an alert, the only consumers of them;
+    # fields already set by a format decoder take precedence
+    if risk_level != "low":
+        for field, value in get_field_extractor(log_entry["source"]).extract(log_entry["message"]).items():
+            log_entry.setdefault(field, value)
+    
+    return record, risk_level
+
+def process_log_entry(log_entry):
+    """
+    Normalize, log and assess a single parsed log entry
+    """
+    record, risk_level = classify_log_entry(log_entry)
+    
+    # Log the parsed entry
+    output_writer.write(record)
+    
+    # Create alert if needed
+    if risk_level != "low":
+        create_alert(log_entry, risk_level)
+
+# Records that failed to decode or process in follow mode
+follow_errors = 0
+
+def process_log_records(decode, record, path):
+    """
+    Decode a record and process its entries, logging instead of raising
+    so one bad line cannot stop the follow loop or crash-loop on restart
+    """
+    global follow_errors
+    try:
+        for log_entry in decode(record):
+            process_log_entry(log_entry)
+    except Exception as e:
+        follow_errors += 1
+        if follow_errors == 1 or follow_errors % 1000 == 0:
+            log_event("error", f"Error processing a record from {path}: {str(e)}", {"errors": follow_errors})
+
+def follow_logs(paths):
+    """
+    Tail the configured log files and process every new line
+    """
+    global active_checkpoints
+    log_event("info", f"Following {len(paths)} log file(s) - Agent {AGENT_NAME} (ID: {AGENT_ID})", {"files": paths})
+    
+    # Records must reach the output before the offsets covering them are saved
+    checkpoints = CheckpointStore(
+        LOG_CHECKPOINT_FILE, CHECKPOINT_INTERVAL, before_flush=output_writer.flush
+    ) if LOG_CHECKPOINT_FILE else None
+    active_checkpoints = checkpoints
+    tailers = [FileTailer(path, LOG_FOLLOW_FROM_START, checkpoints, block_size=READ_BLOCK_SIZE) for path in paths]
+    decoders = {tailer.path: StreamDecoder(tailer.source) for tailer in tailers}
+    assemblers = {tailer.path: MultilineAssembler(tailer.source) for tailer in tailers}
+    idle_wait = 0.01
     
     try:
         while True:
-            # In a real implementation, this would read from actual log sources
-            # For simulation, we randomly select a log entry
-            log_entry = random.choice(SAMPLE_LOG_ENTRIES)
+            got_data = False
+            for tailer in tailers:
+                lines = tailer.read_lines()
+                if lines:
+                    got_data = True
+                decoder = decoders[tailer.path]
+                assembler = assemblers[tailer.path]
+                records = []
+                for line in lines:
+                    text = line.decode("utf-8", "replace").rstrip("\r")
+                    if text.strip():
+                        records.extend(assembler.feed(text, len(line) + 1))
+                records.extend(assembler.flush_expired())
+                
+                for record in records:
+                    process_log_records(decoder.feed, record, tailer.path)
+                # Don't hold back a quiet file's first records forever waiting
+                # for a full sniff sample
+                process_log_records(lambda _: decoder.flush_expired(), None, tailer.path)
+                if not decoder.pending:
+                    # Records still held for sniffing are not covered yet
+                    tailer.save_checkpoint(assembler.pending_size)
             
-            # Add current timestamp
-            log_entry["timestamp"] = datetime.now().isoformat()
+            if checkpoints:
+                checkpoints.maybe_flush()
+            if alert_dedup:
+                alert_dedup.sweep()
             
-            # Normalize log level
-            normalized_level = normalize_log_level(log_entry["level"])
+            # Only back off while every file is idle
+            if got_data:
+                idle_wait = 0.01
+            else:
+                output_writer.flush()
+                time.sleep(idle_wait)
+                idle_wait = min(idle_wait * 2, FOLLOW_IDLE_INTERVAL)
+    finally:
+        for tailer in tailers:
+            decoder = decoders[tailer.path]
+            for record in assemblers[tailer.path].flush():
+                process_log_records(decoder.feed, record, tailer.path)
+            process_log_records(lambda _: decoder.flush(), None, tailer.path)
+        if checkpoints:
+            checkpoints.flush()
+        for tailer in tailers:
+            tailer.close()
+
+# Syslog severities 0-7 (emerg, alert, crit, err, warning, notice, info, debug)
+SYSLOG_SEVERITY_LEVELS = ["CRITICAL", "CRITICAL", "CRITICAL", "ERROR", "WARNING", "NOTICE", "INFO", "DEBUG"]
+
+SYSLOG_FACILITIES = [
+    "kern", "user", "mail", "daemon", "auth", "syslog", "lpr", "news",
+    "uucp", "cron", "authpriv", "ftp", "ntp", "audit", "alert", "clock",
+    "local0", "local1", "local2", "local3", "local4", "local5", "local6", "local7"
+]
+
+SYSLOG_PRI_PATTERN = re.compile(rb"<(\d{1,3})>")
+
+# RFC5424: VERSION TIMESTAMP HOSTNAME APP-NAME PROCID MSGID STRUCTURED-DATA [MSG]
+RFC5424_PATTERN = re.compile(
+    r'1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]"\\]|\\.|"(?:[^"\\]|\\.)*")*\])+) ?(.*)',
+    re.DOTALL
+)
+
+# RFC3164: TIMESTAMP HOSTNAME TAG[PID]: MSG
+RFC3164_PATTERN = re.compile(
+    r"([A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (\S+) ([^:\[\s]+)(?:\[(\d+)\])?: ?(.*)",
+    re.DOTALL
+)
+
+def parse_syslog_message(data):
+    """
+    Parse an RFC5424 or RFC3164 syslog message into a log entry
+    """
+    facility, severity = 1, 5  # user.notice when PRI is missing
+    match = SYSLOG_PRI_PATTERN.match(data)
+    if match:
+        pri = int(match.group(1))
+        facility, severity = pri >> 3, pri & 7
+        data = data[match.end():]
+    
+    text = data.decode("utf-8", "replace").rstrip("\r\n")
+    host = app = None
+    
+    match = RFC5424_PATTERN.match(text)
+    if match:
+        host, app = match.group(2), match.group(3)
+        text = match.group(7).lstrip("\ufeff")
+    else:
+        match = RFC3164_PATTERN.match(text)
+        if match:
+            host, app, text = match.group(2), match.group(3), match.group(5)
+    
+    host = None if host == "-" else host
+    app = None if app == "-" else app
+    facility_name = SYSLOG_FACILITIES[facility] if facility < len(SYSLOG_FACILITIES) else str(facility)
+    return {
+        "level": SYSLOG_SEVERITY_LEVELS[severity],
+        "message": text,
+        "source": app or host or "Syslog",
+        "details": f"Syslog {facility_name} message from {host or 'unknown host'}",
+        "host": host,
+        "facility": facility_name
+    }
+
+class SyslogUDPProtocol(asyncio.DatagramProtocol):
+    """
+    Hands every datagram to the receiver queue without parsing it
+    """
+    
+    def __init__(self, receiver):
+        self.receiver = receiver
+    
+    def connection_made(self, transport):
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            self.receiver.udp_inodes.add(os.fstat(sock.fileno()).st_ino)
+            # A larger kernel buffer absorbs bursts while the queue drains
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            except OSError:
+                pass
+    
+    def datagram_received(self, data, addr):
+        self.receiver.enqueue(data)
+
+class SyslogTCPProtocol(asyncio.Protocol):
+    """
+    Splits a TCP syslog stream into messages using octet-counting
+    (RFC6587 / RFC5425 style "LEN SP MSG") or newline framing
+    """
+    
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self.buffer = bytearray()
+    
+    def connection_made(self, transport):
+        self.transport = transport
+    
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer += data
+        pos = 0
+        size = len(buffer)
+        
+        while pos < size:
+            if 48 <= buffer[pos] <= 57:
+                # Octet-counting: a decimal length, a space, then the message
+                space = buffer.find(b" ", pos, pos + 11)
+                if space == -1 and size - pos <= 10:
+                    break
+                if space == -1 or not buffer[pos:space].isdigit():
+                    # Not a length prefix after all - fall back to newline framing
+                    next_pos = self._take_line(pos, size)
+                    if next_pos is None:
+                        break
+                    pos = next_pos
+                    continue
+                length = int(buffer[pos:space])
+                if length > SYSLOG_MAX_MESSAGE_SIZE:
+                    # A peer announcing an oversized frame would make us
+                    # buffer without limit; drop the connection instead
+                    self.receiver.stats["errors"] += 1
+                    buffer.clear()
+                    self.transport.close()
+                    return
+                end = space + 1 + length
+                if end > size:
+                    break
+                self.receiver.enqueue(bytes(buffer[space + 1:end]))
+                pos = end
+            else:
+                next_pos = self._take_line(pos, size)
+                if next_pos is None:
+                    break
+                pos = next_pos
+        
+        del buffer[:pos]
+    
+    def _take_line(self, pos, size):
+        buffer = self.buffer
+        newline = buffer.find(b"\n", pos)
+        if newline == -1:
+            if size - pos < SYSLOG_MAX_MESSAGE_SIZE:
+                return None
+            # Oversized unterminated message - emit what we have
+            newline = size
+        if newline > pos:
+            self.receiver.enqueue(bytes(buffer[pos:newline]))
+        return newline + 1
+    
+    def eof_received(self):
+        if self.buffer.strip():
+            self.receiver.enqueue(bytes(self.buffer))
+        self.buffer.clear()
+
+class SyslogReceiver:
+    """
+    Asyncio syslog receiver for UDP and TCP
+
+    Socket callbacks only append raw messages to a bounded queue; a separate
+    task parses and assesses them in batches, yielding to the event loop
+    between batches so the readers are never blocked. Messages arriving
+    while the queue is full are dropped and counted, alongside the datagrams
+    the kernel dropped on the UDP socket.
+    """
+    
+    BATCH_SIZE = 512
+    
+    def __init__(self, queue_size=SYSLOG_QUEUE_SIZE):
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.ready = None
+        self.udp_inodes = set()
+        self.stats = {"received": 0, "processed": 0, "dropped": 0, "errors": 0}
+    
+    def enqueue(self, data):
+        self.stats["received"] += 1
+        if len(self.queue) >= self.queue_size:
+            self.stats["dropped"] += 1
+            return
+        self.queue.append(data)
+        if not self.ready.is_set():
+            self.ready.set()
+    
+    async def _consume(self):
+        queue = self.queue
+        while True:
+            if not queue:
+                output_writer.flush()
+                self.ready.clear()
+                try:
+                    # Wake up periodically so idle dedup windows still close
+                    await asyncio.wait_for(self.ready.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+            
+            for _ in range(min(len(queue), self.BATCH_SIZE)):
+                try:
+                    process_log_entry(parse_syslog_message(queue.popleft()))
+                    self.stats["processed"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    if self.stats["errors"] == 1:
+                        log_event("error", f"Error processing syslog message: {str(e)}")
             
-            # Log the parsed entry
+            if alert_dedup:
+                alert_dedup.sweep()
+            await asyncio.sleep(0)
+    
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(SYSLOG_STATS_INTERVAL)
+            kernel_dropped = udp_kernel_drops(self.udp_inodes)
             log_event(
-                normalized_level, 
-                f"[{log_entry['source']}] {log_entry['message']}", 
-                {"source": log_entry["source"], "details": log_entry["details"]}
+                "info",
+                f"Syslog receiver: {self.stats['received']} received, "
+                f"{self.stats['dropped'] + kernel_dropped} dropped",
+                dict(self.stats, kernel_dropped=kernel_dropped, queued=len(self.queue))
             )
-            
-            # Assess security implications
-            risk_level = assess_security_implication(log_entry)
-            
-            # Create alert if needed
-            if risk_level != "low":
-                create_alert(log_entry, risk_level)
+    
+    async def serve(self, host, udp_port=0, tcp_port=0):
+        """
+        Listen on the given ports until cancelled
+        """
+        loop = asyncio.get_running_loop()
+        self.ready = asyncio.Event()
+        transports = []
+        
+        if udp_port:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: SyslogUDPProtocol(self), local_addr=(host, udp_port)
+            )
+            transports.append(transport)
+        
+        server = None
+        if tcp_port:
+            server = await loop.create_server(lambda: SyslogTCPProtocol(self), host, tcp_port)
+        
+        log_event("info", f"Syslog receiver listening on {host} (udp={udp_port or '-'}, tcp={tcp_port or '-'})")
+        
+        try:
+            await asyncio.gather(self._consume(), self._report_stats())
+        finally:
+            for transport in transports:
+                transport.close()
+            if server:
+                server.close()
+
+def expand_log_paths(patterns):
+    """
+    Expand file paths and glob patterns into a sorted list of files
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches and os.path.isfile(pattern):
+            matches = [pattern]
+        if not matches:
+            log_event("warning", f"No log files match {pattern}")
+        paths.extend(path for path in matches if os.path.isfile(path))
+    return list(dict.fromkeys(paths))
+
+def split_into_chunks(path, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Split a file into (path, start, end) byte ranges that begin and end on
+    line boundaries
+
+    A range is extended past the continuation lines that follow it, so a
+    multiline record is never split between two chunks.
+    """
+    size = os.path.getsize(path)
+    start_pattern = MULTILINE_START_PATTERNS.get(os.path.basename(path))
+    chunks = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = start + chunk_size
+            if end < size:
+                # Extend the range to the end of the line it falls in
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+                for _ in range(MULTILINE_MAX_LINES):
+                    line = f.readline()
+                    text = line.decode("utf-8", "replace").rstrip("\r\n")
+                    if not line or (text.strip() and starts_record(text, start_pattern)):
+                        break
+                    end = f.tell()
+            end = min(end, size)
+            chunks.append((path, start, end))
+            start = end
+    return chunks
+
+def iter_flagged_lines(block, keywords=RISK_PREFILTER_KEYWORDS):
+    """
+    Yield the lines of a line-aligned block that contain one of the prefilter
+    keywords, in order
+
+    The block is lowercased once and searched with bytes.find per keyword,
+    which runs at memory speed; only the lines around the hits are sliced out.
+    """
+    lowered = block.lower()
+    hits = set()
+    for keyword in keywords:
+        index = lowered.find(keyword)
+        while index >= 0:
+            hits.add(lowered.rfind(b"\n", 0, index) + 1)
+            # One hit per line is enough - resume at the next line
+            line_end = lowered.find(b"\n", index)
+            if line_end < 0:
+                break
+            index = lowered.find(keyword, line_end)
+    
+    for line_start in sorted(hits):
+        line_end = block.find(b"\n", line_start)
+        yield block[line_start:line_end if line_end >= 0 else len(block)]
+
+def iter_mmap_lines(path, start=0, end=None, keywords=RISK_PREFILTER_KEYWORDS):
+    """
+    Yield the lines of a memory-mapped byte range that contain one of the
+    prefilter keywords, without decoding any other line
+
+    The mapping is scanned in line-aligned blocks, so only one block of the
+    file is copied out of the page cache at a time.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            end = size if end is None else min(end, size)
+            pos = start
+            while pos < end:
+                block_end = mm.find(b"\n", min(pos + MMAP_SCAN_BLOCK_SIZE, end), end)
+                block_end = end if block_end < 0 else block_end + 1
+                yield from iter_flagged_lines(mm[pos:block_end], keywords)
+                pos = block_end
+
+def open_zstd(path):
+    """
+    Open a zstd-compressed file as a streaming binary reader
+    """
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+
+# Streaming openers for rotated, compressed logs, keyed by file extension
+COMPRESSED_OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+    ".lzma": lzma.open
+}
+if zstandard:
+    COMPRESSED_OPENERS[".zst"] = open_zstd
+
+def compressed_opener(path):
+    """
+    Return the streaming opener for a compressed log file, or None
+    """
+    return COMPRESSED_OPENERS.get(os.path.splitext(path)[1].lower())
+
+def iter_stream_blocks(stream, block_size=READ_BLOCK_SIZE):
+    """
+    Read a binary stream in large blocks, yielding line-aligned blocks so that
+    only one block is held in memory at a time
+    """
+    partial = b""
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        data = partial + data
+        newline = data.rfind(b"\n")
+        if newline < 0:
+            partial = data
+            continue
+        partial = data[newline + 1:]
+        yield data[:newline + 1]
+    if partial:
+        yield partial
+
+def iter_compressed_lines(path, alerts_only=False):
+    """
+    Lazily decompress a rotated log file and yield its lines
+    """
+    with compressed_opener(path)(path) as stream:
+        for block in iter_stream_blocks(stream):
+            if alerts_only:
+                yield from iter_flagged_lines(block)
+            else:
+                yield from block.split(b"\n")
+
+def iter_block_lines(path, start=0, end=None):
+    """
+    Yield every line of a byte range, read as a single block
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read() if end is None else f.read(end - start)
+    yield from data.split(b"\n")
+
+def classify_lines(lines, source, output=None, multiline=True):
+    """
+    Classify raw log lines into serialized JSON records
+    Returns the records with line and alert counts; when an output file is
+    given the records are streamed to it, one per line, instead
+    """
+    records_out = []
+    count = alerts = 0
+    for log_entry in decode_lines(lines, source, multiline):
+        record, risk_level = classify_log_entry(log_entry)
+        records_out.append(json.dumps(record))
+        
+        _, records = build_alert_records(log_entry, risk_level)
+        records_out.extend(json.dumps(alert_record) for alert_record in records)
+        count += 1
+        alerts += bool(records)
+        
+        if output is not None and len(records_out) >= BATCH_FRAME_RECORDS:
+            output.write("\n".join(records_out) + "\n")
+            records_out = []
+    
+    if output is not None:
+        if records_out:
+            output.write("\n".join(records_out) + "\n")
+        return None, count, alerts
+    return records_out, count, alerts
+
+def scan_chunk(chunk):
+    """
+    Classify the lines in a byte range of a log file
+    Runs in a pool worker; in alerts-only mode the range is memory-mapped and
+    only lines flagged by the keyword prefilter are decoded and classified,
+    each as a record of its own
+
+    Compressed files are scanned whole (end is None) and their output is
+    spooled to a temporary file, whose path is returned in place of the output.
+    """
+    path, start, end, alerts_only = chunk
+    source = os.path.basename(path)
+    
+    if compressed_opener(path):
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as spool:
+            _, count, alerts = classify_lines(
+                iter_compressed_lines(path, alerts_only), source, spool, multiline=not alerts_only
+            )
+        return spool.name, count, alerts
+    
+    reader = iter_mmap_lines if alerts_only else iter_block_lines
+    return classify_lines(reader(path, start, end), source, multiline=not alerts_only)
+
+def benchmark_readers(path):
+    """
+    Compare plain file iteration against the mmap prefilter reader on one file
+    """
+    size = os.path.getsize(path)
+    results = {}
+    
+    started = time.perf_counter()
+    flagged = 0
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if assess_security_implication({"message": line})[0] != "low":
+                flagged += 1
+    results["file_iteration"] = (time.perf_counter() - started, flagged)
+    
+    started = time.perf_counter()
+    flagged = 0
+    for line in iter_mmap_lines(path):
+        if assess_security_implication({"message": line.decode("utf-8", "replace")})[0] != "low":
+            flagged += 1
+    results["mmap_prefilter"] = (time.perf_counter() - started, flagged)
+    
+    for reader, (elapsed, flagged) in results.items():
+        log_event(
+            "info",
+            f"{reader}: {size / elapsed / 1e6:.1f} MB/s, {flagged} flagged lines in {elapsed:.2f}s",
+            {"reader": reader, "bytes": size, "seconds": elapsed, "flagged": flagged}
+        )
+    return results
+
+def run_batch(patterns, workers=None, alerts_only=False):
+    """
+    Offline batch mode: re-scan archived log files across a process pool,
+    writing the same records the live agent emits in batch frames
+
+    With alerts_only, files are memory-mapped and only lines that can raise
+    an alert are decoded, so no log records are written for the rest.
+    Compressed files (.gz, .bz2, .xz, .zst) are decompressed as streams, one
+    file per worker.
+    """
+    paths = expand_log_paths(patterns)
+    chunks = []
+    for path in paths:
+        if compressed_opener(path):
+            # Compressed streams cannot be split, so each file is one task
+            chunks.append((path, 0, None, alerts_only))
+        else:
+            chunks.extend(chunk + (alerts_only,) for chunk in split_into_chunks(path))
+    workers = workers or os.cpu_count() or 1
+    log_event("info", f"Batch scan of {len(paths)} file(s) in {len(chunks)} chunk(s) using {workers} worker(s)")
+    
+    started = time.time()
+    total_lines = total_alerts = 0
+    output_writer.flush()
+    with multiprocessing.Pool(processes=workers) as pool:
+        # imap keeps the output in file and chunk order
+        for chunk, (output, lines, alerts) in zip(chunks, pool.imap(scan_chunk, chunks)):
+            if chunk[2] is None:
+                # Spooled output of a compressed file
+                with open(output) as spool:
+                    frame = []
+                    for line in spool:
+                        frame.append(line.rstrip("\n"))
+                        if len(frame) >= BATCH_FRAME_RECORDS:
+                            output_writer.write_serialized_batch(frame)
+                            frame = []
+                    output_writer.write_serialized_batch(frame)
+                os.unlink(output)
+            else:
+                for start in range(0, len(output), BATCH_FRAME_RECORDS):
+                    output_writer.write_serialized_batch(output[start:start + BATCH_FRAME_RECORDS])
+            total_lines += lines
+            total_alerts += alerts
+    
+    elapsed = time.time() - started
+    log_event(
+        "info",
+        f"Batch scan complete: {total_lines} lines, {total_alerts} alerts in {elapsed:.1f}s",
+        {"files": paths, "lines": total_lines, "alerts": total_alerts, "seconds": elapsed}
+    )
+
+def parse_logs():
+    """
+    Main function that simulates log parsing, or receives syslog / follows
+    LOG_FILES when those are configured
+    """
+    log_event("info", f"Log parsing started - Agent {AGENT_NAME} (ID: {AGENT_ID})")
+    
+    try:
+        if SYSLOG_UDP_PORT or SYSLOG_TCP_PORT:
+            asyncio.run(SyslogReceiver().serve(SYSLOG_HOST, SYSLOG_UDP_PORT, SYSLOG_TCP_PORT))
+            return
+        
+        if LOG_FILES:
+            follow_logs(LOG_FILES)
+            return
+        
+        while True:
+            # In a real implementation, this would read from actual log sources
+            # For simulation, we randomly select a log entry
+            log_entry = random.choice(SAMPLE_LOG_ENTRIES)
+            process_log_entry(log_entry)
+            output_writer.flush()
             
             # Sleep between 20-40 seconds to simulate log checking interval
             wait_time = random.randint(20, 40)
@@ -238,8 +1600,20 @@ def parse_logs():
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ATRO-Lite log parser agent")
+    parser.add_argument("--batch", nargs="+", metavar="PATH", help="scan log files or glob patterns offline and exit")
+    parser.add_argument("--workers", type=int, help="worker processes for --batch (default: all cores)")
+    parser.add_argument("--alerts-only", action="store_true", help="with --batch, memory-map files and only emit lines that raise alerts")
+    parser.add_argument("--benchmark", metavar="FILE", help="compare plain file iteration with the mmap reader on FILE")
+    args = parser.parse_args()
+    
     try:
-        parse_logs()
+        if args.benchmark:
+            benchmark_readers(args.benchmark)
+        elif args.batch:
+            run_batch(args.batch, args.workers, args.alerts_only)
+        else:
+            parse_logs()
     except KeyboardInterrupt:
         print("Log parsing stopped")
     except Exception as e:
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Log File Tailing for ATRO-Lite
+
+Shared by the agents that read logs as they are written: a tailer that
+follows a log file across logrotate renames and truncation, resuming from
+durable read offsets after a restart, and the kernel drop counter of UDP log
+receivers.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+READ_BLOCK_SIZE = 1024 * 1024
+FINGERPRINT_SIZE = 1024
+
+def file_fingerprint(fd, size=FINGERPRINT_SIZE):
+    """
+    Fingerprint the first bytes of an open file, to tell a file apart from
+    a different one that reuses its inode
+    """
+    head = os.pread(fd, size, 0)
+    return hashlib.sha1(head).hexdigest(), len(head)
+
+class CheckpointStore:
+    """
+    Durable read offsets for followed files
+
+    Each file's checkpoint records its device, inode, processed offset and a
+    fingerprint of its first bytes. Updates are kept in memory and written
+    atomically at most every interval seconds, and on shutdown. Whatever
+    the offsets cover must be durable first, so before_flush (if given) is
+    called ahead of every write, e.g. to flush buffered output.
+    """
+    
+    def __init__(self, path, interval=5, before_flush=None):
+        self.path = path
+        self.interval = interval
+        self.before_flush = before_flush
+        self.checkpoints = self._load()
+        self.dirty = False
+        self.last_flush = time.monotonic()
+    
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def get(self, path):
+        return self.checkpoints.get(path)
+    
+    def update(self, path, file_id, offset, fingerprint, fingerprint_size):
+        self.checkpoints[path] = {
+            "device": file_id[0],
+            "inode": file_id[1],
+            "offset": offset,
+            "fingerprint": fingerprint,
+            "fingerprint_size": fingerprint_size
+        }
+        self.dirty = True
+    
+    def maybe_flush(self):
+        if self.dirty and time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+    
+    def flush(self):
+        """
+        Atomically write the checkpoints to disk
+        """
+        self.last_flush = time.monotonic()
+        if not self.dirty:
+            return
+        if self.before_flush:
+            self.before_flush()
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.checkpoints, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"Error writing log checkpoints: {e}")
+
+class FileTailer:
+    """
+    Follow a single log file, surviving logrotate renames and truncation
+
+    The file is read in block_size blocks and split into lines in memory,
+    carrying any incomplete trailing line over to the next read. With a
+    checkpoint store, a restarted tailer resumes from the last saved offset.
+    
+    A file joined past its start can still have its leading header block
+    (lines starting with header_prefix, such as the "#fields" directives of
+    Zeek TSV logs) returned first, since later lines cannot be read without it.
+    """
+    
+    def __init__(self, path, from_start=False, checkpoints=None, block_size=READ_BLOCK_SIZE, header_prefix=None):
+        self.path = path
+        self.source = os.path.basename(path)
+        self.from_start = from_start
+        self.checkpoints = checkpoints
+        self.block_size = block_size
+        self.header_prefix = header_prefix
+        self.header = []
+        self.file = None
+        self.file_id = None
+        self.offset = 0
+        self.partial = b""
+        self.fingerprint = None
+        self.saved_position = None
+    
+    def _open(self):
+        # Only a file present at startup may be skipped to its end; files that
+        # appear later (e.g. post-rotation) are read in full
+        seek_end = not self.from_start
+        self.from_start = True
+        
+        try:
+            self.file = open(self.path, "rb")
+        except OSError:
+            return False
+        
+        stat = os.fstat(self.file.fileno())
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.partial = b""
+        self.fingerprint = None
+        
+        checkpoint = self.checkpoints.get(self.path) if self.checkpoints else None
+        if checkpoint:
+            # Resume only if this is the same file and it has not been truncated;
+            # anything else replaced the file while we were down, so read it all
+            self.offset = 0
+            if (
+                (checkpoint["device"], checkpoint["inode"]) == self.file_id
+                and stat.st_size >= checkpoint["offset"]
+                and file_fingerprint(self.file.fileno(), checkpoint["fingerprint_size"])[0] == checkpoint["fingerprint"]
+            ):
+                self.offset = self.file.seek(checkpoint["offset"])
+        else:
+            self.offset = self.file.seek(0, os.SEEK_END) if seek_end else 0
+        if self.offset and self.header_prefix:
+            self.header = self._read_header()
+        return True
+    
+    def _read_header(self):
+        """
+        Complete leading lines starting with header_prefix, read without
+        moving the file position
+        """
+        head = os.pread(self.file.fileno(), min(self.offset, self.block_size), 0)
+        header = []
+        for line in head.split(b"\n")[:-1]:
+            if not line.startswith(self.header_prefix):
+                break
+            header.append(line)
+        return header
+    
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+    
+    def save_checkpoint(self, held_back=0):
+        """
+        Record the offset of the last complete line handed out, less the
+        bytes of lines still held back by the caller
+        """
+        if not self.checkpoints or self.file is None:
+            return
+        position = (self.file_id, max(0, self.offset - len(self.partial) - held_back))
+        if position == self.saved_position:
+            return
+        self.saved_position = position
+        if self.fingerprint is None or self.fingerprint[1] < FINGERPRINT_SIZE:
+            # Small files are re-fingerprinted until they reach full size
+            self.fingerprint = file_fingerprint(self.file.fileno())
+        self.checkpoints.update(self.path, *position, *self.fingerprint)
+    
+    def read_lines(self):
+        """
+        Return the complete lines available since the last call
+        """
+        if self.file is None and not self._open():
+            return []
+        if self.header:
+            header, self.header = self.header, []
+            return header
+        
+        block = self.file.read(self.block_size)
+        if block:
+            self.offset += len(block)
+            lines = (self.partial + block).split(b"\n")
+            self.partial = lines.pop()
+            return lines
+        
+        return self._check_rotation()
+    
+    def _check_rotation(self):
+        """
+        At EOF, detect whether the file was rotated away or truncated
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Renamed away and not recreated yet - keep reading the old file
+            return []
+        
+        if (stat.st_dev, stat.st_ino) != self.file_id:
+            # Rotated: the old file is drained, so switch to the new one
+            leftover = [self.partial] if self.partial else []
+            self.close()
+            self._open()
+            return leftover
+        
+        if stat.st_size < self.offset:
+            # Truncated in place (copytruncate)
+            self.file.seek(0)
+            self.offset = 0
+            self.partial = b""
+            self.fingerprint = None
+        
+        return []
+
+def udp_kernel_drops(inodes):
+    """
+    Datagrams the kernel dropped on the given UDP sockets before they could
+    be read, from the drops column of /proc/net/udp (Linux only)
+    """
+    drops = 0
+    for table in ("/proc/net/udp", "/proc/net/udp6"):
+        try:
+            with open(table) as f:
+                next(f)
+                for row in f:
+                    fields = row.split()
+                    if int(fields[9]) in inodes:
+                        drops += int(fields[-1])
+        except (OSError, ValueError, IndexError, StopIteration):
+            continue
+    return drops
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+MCP Streams Transport for ATRO-Lite
+
+Pub/sub notifications are lost when nobody is subscribed at the moment they
+are published. Every MCP notification is therefore also appended to a
+bounded Redis Stream named after its channel ("mcp:network:threats" is
+mirrored to "mcp:stream:network:threats"). Consumers read these streams
+through a consumer group, so several agents can share the work, every entry
+is delivered at least once, and entries left unacknowledged by a crashed
+consumer are reclaimed by the others.
+"""
+
+import json
+import os
+import time
+
+# Approximate number of entries kept per stream (0 disables streams)
+MCP_STREAM_MAXLEN = int(os.environ.get('MCP_STREAM_MAXLEN', '10000'))
+
+# How long a blocking read waits for new entries, in milliseconds
+MCP_STREAM_BLOCK_MS = int(os.environ.get('MCP_STREAM_BLOCK_MS', '1000'))
+MCP_STREAM_READ_COUNT = int(os.environ.get('MCP_STREAM_READ_COUNT', '32'))
+
+# Entries pending longer than this are reclaimed from their consumer
+MCP_STREAM_CLAIM_IDLE_MS = int(os.environ.get('MCP_STREAM_CLAIM_IDLE_MS', '60000'))
+MCP_STREAM_CLAIM_INTERVAL = float(os.environ.get('MCP_STREAM_CLAIM_INTERVAL', '15'))
+
+# Where a newly created group starts: "0" replays the retained history
+MCP_STREAM_START_ID = os.environ.get('MCP_STREAM_START_ID', '0')
+
+# Channels carrying threats the response agents act on
+THREAT_CHANNELS = ["mcp:network:threats", "mcp:logs:alerts"]
+
+def stream_for_channel(channel):
+    """
+    Name of the stream mirroring a pub/sub channel
+    """
+    return "mcp:stream:" + channel[len("mcp:"):] if channel.startswith("mcp:") else "mcp:stream:" + channel
+
+def _text(value):
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+
+class StreamConsumer:
+    """
+    Consumer group reader over one or more MCP streams
+
+    read() returns (stream, entry_id, context) tuples. Each entry must be
+    passed to ack() once it has been handled; entries that are never
+    acknowledged stay pending and are redelivered, either to this consumer
+    when it restarts under the same name or to another consumer of the group
+    once they have been idle for claim_idle_ms. Entries read but not yet
+    acknowledged are never reclaimed by the consumer that holds them.
+    """
+
+    def __init__(
+        self,
+        client,
+        streams,
+        group,
+        consumer,
+        block_ms=MCP_STREAM_BLOCK_MS,
+        count=MCP_STREAM_READ_COUNT,
+        claim_idle_ms=MCP_STREAM_CLAIM_IDLE_MS,
+        claim_interval=MCP_STREAM_CLAIM_INTERVAL,
+        start_id=MCP_STREAM_START_ID
+    ):
+        self.client = client
+        self.streams = list(streams)
+        self.group = group
+        self.consumer = consumer
+        self.block_ms = block_ms
+        self.count = count
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self.next_claim = 0
+        # Where each stream's pending-entries scan resumes
+        self.claim_cursors = {stream: "0-0" for stream in self.streams}
+        # (stream, entry_id) read by this consumer and not yet acknowledged
+        self.in_flight = set()
+        # Start by re-reading our own pending entries left by a previous run
+        self.offsets = {stream: "0" for stream in self.streams}
+        self.stats = {"read": 0, "acked": 0, "reclaimed": 0, "malformed": 0}
+
+        for stream in self.streams:
+            try:
+                client.xgroup_create(stream, group, id=start_id, mkstream=True)
+            except Exception as e:
+                # BUSYGROUP: the group already exists
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    def read(self):
+        """
+        Read the next entries for this consumer, blocking up to block_ms
+        """
+        entries = self._reclaim()
+        if entries:
+            return entries
+
+        # Pending history is read without blocking; new entries with it
+        replaying = any(offset != ">" for offset in self.offsets.values())
+        response = self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            self.offsets,
+            count=self.count,
+            block=None if replaying else self.block_ms
+        )
+
+        entries = []
+        drained = set(self.streams)
+        for stream, messages in response or []:
+            stream = _text(stream)
+            if messages:
+                drained.discard(stream)
+                if self.offsets[stream] != ">":
+                    # Page through the pending history
+                    self.offsets[stream] = _text(messages[-1][0])
+            entries.extend(self._decode(stream, messages))
+        if replaying:
+            # A stream whose pending history came back empty is caught up
+            for stream in drained:
+                self.offsets[stream] = ">"
+        self.in_flight.update((stream, entry_id) for stream, entry_id, _ in entries)
+        self.stats["read"] += len(entries)
+        return entries
+
+    def ack(self, stream, entry_id):
+        """
+        Acknowledge a handled entry so it is not delivered again
+        """
+        # Released even if the ack fails, so the entry can be reclaimed later
+        self.in_flight.discard((stream, entry_id))
+        self.client.xack(stream, self.group, entry_id)
+        self.stats["acked"] += 1
+
+    def _reclaim(self):
+        """
+        Take over entries other consumers left pending for too long
+
+        Each call claims one page per stream and resumes where the previous
+        page ended, so a long pending list is walked across calls instead of
+        rescanning its head. While a scan is unfinished the next page is
+        claimed on the next read rather than after claim_interval.
+        """
+        now = time.monotonic()
+        if now < self.next_claim:
+            return []
+
+        entries = []
+        for stream in self.streams:
+            result = self.client.xautoclaim(
+                stream,
+                self.group,
+                self.consumer,
+                self.claim_idle_ms,
+                start_id=self.claim_cursors[stream],
+                count=self.count
+            )
+            # "0-0" once the scan has reached the end of the pending list
+            self.claim_cursors[stream] = _text(result[0])
+            # Redis 7 adds a list of deleted ids as a third element;
+            # entries still waiting in our own queue are not handed out twice
+            entries.extend(
+                entry for entry in self._decode(stream, result[1])
+                if (entry[0], entry[1]) not in self.in_flight
+            )
+        if all(cursor == "0-0" for cursor in self.claim_cursors.values()):
+            self.next_claim = now + self.claim_interval
+        self.in_flight.update((stream, entry_id) for stream, entry_id, _ in entries)
+        self.stats["reclaimed"] += len(entries)
+        return entries
+
+    def _decode(self, stream, messages):
+        entries = []
+        for entry_id, fields in messages:
+            entry_id = _text(entry_id)
+            if not fields:
+                # Trimmed by MAXLEN while pending; nothing left to handle
+                self.ack(stream, entry_id)
+                continue
+            data = fields.get(b"data", fields.get("data"))
+            try:
+                context = json.loads(data)
+            except (TypeError, ValueError):
+                self.stats["malformed"] += 1
+                self.ack(stream, entry_id)
+                continue
+            entries.append((stream, entry_id, context))
+        return entries
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+MCP Context Writer for ATRO-Lite
+
+Agents share context with each other through Redis: the latest context for a
+topic is stored under an "mcp:context:*" key and announced on an "mcp:*"
+channel, and appended to the bounded stream mirroring that channel (see
+mcp_streams). Instead of a round trip per command and event, the writer
+queues events and sends them in batches, either as one non-transactional
+pipeline or, optionally, as one server-side script call that performs
+SET+EXPIRE+PUBLISH+XADD for the whole batch.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+from mcp_streams import MCP_STREAM_MAXLEN, stream_for_channel
+
+# Lifetime of shared context keys in seconds (0 keeps them forever)
+MCP_CONTEXT_TTL = int(os.environ.get('MCP_CONTEXT_TTL', '3600'))
+
+# Flush policy: whichever limit is reached first triggers a flush
+MCP_BATCH_SIZE = int(os.environ.get('MCP_BATCH_SIZE', '64'))
+MCP_MAX_LATENCY = float(os.environ.get('MCP_MAX_LATENCY', '0.05'))
+
+# Send batches through a server-side Lua script instead of a pipeline
+MCP_USE_SCRIPT = os.environ.get('MCP_USE_SCRIPT', 'false').lower() == 'true'
+
+# KEYS: context keys to set, then one stream per event when streams are
+# enabled; ARGV: ttl, stream maxlen, number of context keys, one payload per
+# context key, then a channel/payload pair per event to publish
+SHARE_CONTEXT_SCRIPT = """
+local ttl = tonumber(ARGV[1])
+local maxlen = ARGV[2]
+local contexts = tonumber(ARGV[3])
+local streaming = #KEYS > contexts
+for i = 1, contexts do
+    if ttl > 0 then
+        redis.call('SET', KEYS[i], ARGV[i + 3], 'EX', ttl)
+    else
+        redis.call('SET', KEYS[i], ARGV[i + 3])
+    end
+end
+local event = 0
+for i = contexts + 4, #ARGV, 2 do
+    event = event + 1
+    redis.call('PUBLISH', ARGV[i], ARGV[i + 1])
+    if streaming then
+        redis.call('XADD', KEYS[contexts + event], 'MAXLEN', '~', maxlen, '*', 'data', ARGV[i + 1])
+    end
+end
+return contexts
+"""
+
+class MCPWriter:
+    """
+    Batched writer for MCP context keys and notifications
+
+    share() only queues the event; a background thread sends the queue once
+    it holds batch_size events or its oldest event has waited max_latency
+    seconds. Within a batch only the last payload per key is stored, while
+    every event is still published.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl=MCP_CONTEXT_TTL,
+        batch_size=MCP_BATCH_SIZE,
+        max_latency=MCP_MAX_LATENCY,
+        use_script=MCP_USE_SCRIPT,
+        stream_maxlen=MCP_STREAM_MAXLEN,
+        on_error=None
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.stream_maxlen = stream_maxlen
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.script = client.register_script(SHARE_CONTEXT_SCRIPT) if use_script else None
+        self.on_error = on_error or (lambda e: print(f"Error sharing context with MCP: {e}", file=sys.stderr))
+        self.pending = []
+        self.oldest = None
+        # Re-entrant so a signal handler flushing at exit cannot deadlock
+        # against a share interrupted on the same thread
+        self.lock = threading.RLock()
+        self.ready = threading.Condition(self.lock)
+        # Batches go out one at a time so notifications keep their order
+        self.send_lock = threading.RLock()
+        self.stats = {"events": 0, "batches": 0, "failed_events": 0}
+        
+        atexit.register(self.flush)
+        self.flusher = threading.Thread(target=self._run_flusher, name="mcp-writer-flusher", daemon=True)
+        self.flusher.start()
+
+    def share(self, key, channel, context_data):
+        """
+        Queue context_data to be stored under key and published on channel
+        """
+        payload = context_data if isinstance(context_data, str) else json.dumps(context_data)
+        with self.lock:
+            if not self.pending:
+                self.oldest = time.monotonic()
+                self.ready.notify()
+            self.pending.append((key, channel, payload))
+            if len(self.pending) >= self.batch_size:
+                self.ready.notify()
+
+    def flush(self):
+        """
+        Send everything queued so far
+        """
+        with self.lock:
+            batch = self._take_locked()
+        self._send(batch)
+
+    def _take_locked(self):
+        batch = self.pending
+        self.pending = []
+        self.oldest = None
+        return batch
+
+    def _send(self, batch):
+        if not batch:
+            return
+        # The last write to a key wins, so earlier SETs in the batch are dropped
+        latest = {}
+        for key, channel, payload in batch:
+            latest[key] = payload
+        
+        with self.send_lock:
+            try:
+                if self.script:
+                    # Streams are keys too, so they are declared in KEYS
+                    keys = list(latest)
+                    args = [self.ttl, self.stream_maxlen, len(keys)] + list(latest.values())
+                    for key, channel, payload in batch:
+                        if self.stream_maxlen:
+                            keys.append(stream_for_channel(channel))
+                        args.extend((channel, payload))
+                    self.script(keys=keys, args=args)
+                else:
+                    pipe = self.client.pipeline(transaction=False)
+                    for key, payload in latest.items():
+                        pipe.set(key, payload, ex=self.ttl or None)
+                    for key, channel, payload in batch:
+                        pipe.publish(channel, payload)
+                        if self.stream_maxlen:
+                            pipe.xadd(
+                                stream_for_channel(channel),
+                                {"data": payload},
+                                maxlen=self.stream_maxlen,
+                                approximate=True
+                            )
+                    pipe.execute()
+                self.stats["events"] += len(batch)
+                self.stats["batches"] += 1
+            except Exception as e:
+                self.stats["failed_events"] += len(batch)
+                self.on_error(e)
+
+    def _run_flusher(self):
+        """
+        Background thread sending full or overdue batches
+        """
+        while True:
+            with self.lock:
+                while True:
+                    if len(self.pending) >= self.batch_size:
+                        break
+                    if self.pending:
+                        remaining = self.oldest + self.max_latency - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.ready.wait(remaining)
+                    else:
+                        self.ready.wait()
+                batch = self._take_locked()
+            self._send(batch)
@@ -7,20 +7,77 @@ In a production environment, this would integrate with tools like
 Zeek or Suricata for actual network monitoring.
 """
 
+import argparse
+import asyncio
 import json
+import math
 import os
 import random
 import redis
 import signal
+import socket
+import struct
 import sys
 import time
+from collections import OrderedDict, deque
 from datetime import datetime
+from operator import itemgetter
+
+from agent_output import RecordWriter
+from log_tail import FileTailer, udp_kernel_drops
+from mcp_writer import MCPWriter
 
 # Configuration from environment
 AGENT_ID = os.environ.get('AGENT_ID', '0')
 AGENT_NAME = os.environ.get('AGENT_NAME', 'Network Monitor')
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 
+# Packet captures (pcap or pcapng) to analyze instead of simulated events
+NETWORK_CAPTURE_FILES = [
+    path.strip()
+    for path in os.environ.get('NETWORK_CAPTURE_FILES', '').replace(os.pathsep, ',').split(',')
+    if path.strip()
+]
+CAPTURE_READ_BLOCK_SIZE = int(os.environ.get('CAPTURE_READ_BLOCK_SIZE', str(4 * 1024 * 1024)))
+
+# Failed connection attempts (resets, unanswered SYNs) are not alerted one by
+# one; a source is reported once it makes this many within the window
+FAILED_ATTEMPT_THRESHOLD = int(os.environ.get('FAILED_ATTEMPT_THRESHOLD', '20'))
+FAILED_ATTEMPT_WINDOW = float(os.environ.get('FAILED_ATTEMPT_WINDOW', '60'))
+FAILED_ATTEMPT_MAX_SOURCES = int(os.environ.get('FAILED_ATTEMPT_MAX_SOURCES', '50000'))
+
+# Zeek conn/dns logs and Suricata eve.json files to follow as they grow
+NETWORK_LOG_FILES = [
+    path.strip()
+    for path in os.environ.get('NETWORK_LOG_FILES', '').replace(os.pathsep, ',').split(',')
+    if path.strip()
+]
+NETWORK_FOLLOW_FROM_START = os.environ.get('NETWORK_FOLLOW_FROM_START', 'false').lower() == 'true'
+NETWORK_FOLLOW_INTERVAL = float(os.environ.get('NETWORK_FOLLOW_INTERVAL', '0.5'))
+NETWORK_READ_BLOCK_SIZE = int(os.environ.get('NETWORK_READ_BLOCK_SIZE', str(1024 * 1024)))
+
+# Scan detection: distinct ports/hosts per source over a sliding window
+SCAN_DETECTION = os.environ.get('SCAN_DETECTION', 'true').lower() == 'true'
+SCAN_WINDOW = float(os.environ.get('SCAN_WINDOW', '60'))
+SCAN_BUCKETS = int(os.environ.get('SCAN_BUCKETS', '6'))
+SCAN_PORT_THRESHOLD = int(os.environ.get('SCAN_PORT_THRESHOLD', '25'))
+SCAN_HOST_THRESHOLD = int(os.environ.get('SCAN_HOST_THRESHOLD', '25'))
+SCAN_SKETCH_BITS = int(os.environ.get('SCAN_SKETCH_BITS', '1024'))
+SCAN_MAX_SOURCES = int(os.environ.get('SCAN_MAX_SOURCES', '50000'))
+
+# Flow table: per 5-tuple counters expired on idle and active timeouts
+FLOW_TABLE = os.environ.get('FLOW_TABLE', 'true').lower() == 'true'
+FLOW_IDLE_TIMEOUT = float(os.environ.get('FLOW_IDLE_TIMEOUT', '30'))
+FLOW_ACTIVE_TIMEOUT = float(os.environ.get('FLOW_ACTIVE_TIMEOUT', '300'))
+FLOW_WHEEL_TICK = float(os.environ.get('FLOW_WHEEL_TICK', '1'))
+FLOW_TABLE_MAX_BYTES = int(os.environ.get('FLOW_TABLE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# NetFlow v5/v9 and IPFIX collector (a port of 0 disables it)
+NETFLOW_HOST = os.environ.get('NETFLOW_HOST', '0.0.0.0')
+NETFLOW_PORT = int(os.environ.get('NETFLOW_PORT', '0'))
+NETFLOW_QUEUE_SIZE = int(os.environ.get('NETFLOW_QUEUE_SIZE', '10000'))
+NETFLOW_STATS_INTERVAL = float(os.environ.get('NETFLOW_STATS_INTERVAL', '60'))
+
 # Sample network events to simulate monitoring
 SAMPLE_NETWORK_EVENTS = [
     {
@@ -73,6 +130,12 @@ except Exception as e:
     print(f"Error connecting to Redis: {e}")
     redis_client = None
 
+# Batched SET+PUBLISH of shared context
+mcp_writer = MCPWriter(redis_client) if redis_client else None
+
+# Sequence-numbered NDJSON output to the Node.js process
+output_writer = RecordWriter()
+
 # Signal handlers for graceful shutdown
 def handle_signal(signum, frame):
     print(f"Received signal {signum}, shutting down...")
@@ -91,7 +154,7 @@ def log_event(level, message, metadata=None):
         "message": message,
         "metadata": metadata or {}
     }
-    print(json.dumps(log_data))
+    output_writer.write(log_data)
 
 def detect_threat(event):
     """
@@ -108,9 +171,12 @@ def detect_threat(event):
             threat_level = "high"
     
     elif event["type"] == "scan":
-        # Port scanning
+        # Port scanning; sweeps across many hosts are high severity
         threat_level = "medium"
-        if len(event.get("ports", [])) > 10:  # Scanning many ports
+        # Scanning many ports; detector scans carry an estimated count
+        if max(len(event.get("ports", [])), event.get("distinct_ports", 0)) > 10:
+            threat_level = "high"
+        elif event.get("scan_kind") in ("horizontal", "block"):
             threat_level = "high"
     
     elif event["type"] == "traffic" and event.get("port") in [4444, 8888, 9999]:
@@ -123,18 +189,18 @@ def detect_threat(event):
         # DNS queries to malicious domains
         threat_level = "critical"
     
+    elif event["type"] == "ids":
+        # Alerts raised by an IDS sensor keep the sensor's severity
+        threat_level = event.get("severity", "medium")
+    
     # Share context with MCP
-    if redis_client and threat_level in ["high", "critical"]:
-        try:
-            context_data = {
-                "event": event,
-                "threat_level": threat_level,
-                "timestamp": datetime.now().isoformat()
-            }
-            redis_client.set(f"mcp:context:network:{event['type']}", json.dumps(context_data))
-            redis_client.publish("mcp:network:threats", json.dumps(context_data))
-        except Exception as e:
-            print(f"Error sharing context with MCP: {e}")
+    if mcp_writer and threat_level in ["high", "critical"]:
+        context_data = {
+            "event": event,
+            "threat_level": threat_level,
+            "timestamp": datetime.now().isoformat()
+        }
+        mcp_writer.share(f"mcp:context:network:{event['type']}", "mcp:network:threats", context_data)
     
     return threat_level
 
@@ -150,7 +216,7 @@ def create_alert(event, threat_level):
             "description": f"{event['details']} from {event['source']} to {event['destination']}",
             "metadata": event
         }
-        print(json.dumps(alert_data))
+        output_writer.write(alert_data)
         
         # For high severity threats, create an incident
         if threat_level in ["high", "critical"]:
@@ -162,7 +228,1611 @@ def create_alert(event, threat_level):
                     "threat_level": threat_level
                 }
             }
-            print(json.dumps(incident_data))
+            output_writer.write(incident_data)
+
+_event_seconds = {}
+
+def event_seconds(timestamp):
+    """
+    Epoch seconds of an ISO 8601 event timestamp, to the second
+    """
+    if not timestamp:
+        return time.time()
+    key = timestamp[:19]
+    seconds = _event_seconds.get(key)
+    if seconds is None:
+        try:
+            seconds = datetime.fromisoformat(key).timestamp()
+        except ValueError:
+            return time.time()
+        if len(_event_seconds) >= 4096:
+            _event_seconds.clear()
+        _event_seconds[key] = seconds
+    return seconds
+
+def sketch_count_bits(set_bits, bits):
+    """
+    Distinct items hashed into a bitmap of the given size with set_bits of
+    its bits set, estimated by linear counting
+    """
+    empty = bits - set_bits
+    if not empty:
+        # Saturated: report the largest count the sketch can tell apart
+        return round(bits * math.log(bits))
+    return round(bits * math.log(bits / empty))
+
+class SourceScanState:
+    """
+    Per-bucket port and host bitmaps of one source, oldest bucket first
+    """
+    __slots__ = ("slots", "ports", "hosts", "older_ports", "older_hosts", "alerted")
+
+    def __init__(self):
+        self.slots = []
+        self.ports = []
+        self.hosts = []
+        # Union of every bucket but the newest
+        self.older_ports = 0
+        self.older_hosts = 0
+        # scan kind -> bucket slot it was last reported in
+        self.alerted = {}
+
+class ScanDetector:
+    """
+    Sliding-window detector for port scans and host sweeps
+
+    The window of each source is split into buckets, each holding two
+    fixed-size bitmaps of the destination ports and destination hosts the
+    source contacted. Distinct counts over the window are estimated from
+    the union of the buckets, so the state of a source stays bounded
+    however many connections it makes; beyond max_sources the least
+    recently seen sources are forgotten.
+
+    Reaching the port threshold is a vertical scan, reaching the host
+    threshold a horizontal scan (host sweep), and reaching both a block
+    scan. Each kind is reported at most once per window for a source, as
+    soon as the connection that crosses the threshold is observed.
+    """
+
+    def __init__(
+        self,
+        window=SCAN_WINDOW,
+        buckets=SCAN_BUCKETS,
+        port_threshold=SCAN_PORT_THRESHOLD,
+        host_threshold=SCAN_HOST_THRESHOLD,
+        sketch_bits=SCAN_SKETCH_BITS,
+        max_sources=SCAN_MAX_SOURCES
+    ):
+        self.window = window
+        self.buckets = buckets
+        self.bucket_seconds = window / buckets
+        self.port_threshold = port_threshold
+        self.host_threshold = host_threshold
+        # Rounded down to a power of two so a mask selects the bit
+        self.bits = 1 << (sketch_bits.bit_length() - 1)
+        self.shift = 32 - (self.bits.bit_length() - 1)
+        self.mask = self.bits - 1
+        # Bits that must be set for the estimate to reach each threshold
+        self.port_bits = self._bits_for(port_threshold)
+        self.host_bits = self._bits_for(host_threshold)
+        self.max_sources = max_sources
+        # source -> SourceScanState, in least-recently-seen order
+        self.sources = OrderedDict()
+        self.stats = {"evicted": 0, "vertical": 0, "horizontal": 0, "block": 0}
+
+    def observe(self, event):
+        """
+        Account one connection event; returns a scan event when the source
+        crosses a threshold, else None
+        """
+        port = event.get("port")
+        source = event.get("source")
+        destination = event.get("destination")
+        if port is None or not source or not destination or event["type"] not in ("traffic", "connection"):
+            return None
+        slot = int(event_seconds(event.get("timestamp")) // self.bucket_seconds)
+        
+        state = self.sources.get(source)
+        if state is None:
+            state = self.sources[source] = SourceScanState()
+            if len(self.sources) > self.max_sources:
+                self.sources.popitem(last=False)
+                self.stats["evicted"] += 1
+        else:
+            self.sources.move_to_end(source)
+        
+        # Late events count towards the newest bucket
+        if not state.slots or slot > state.slots[-1]:
+            state.slots.append(slot)
+            state.ports.append(0)
+            state.hosts.append(0)
+            while state.slots[0] <= slot - self.buckets:
+                # Slid out of the window
+                del state.slots[0], state.ports[0], state.hosts[0]
+            state.older_ports = state.older_hosts = 0
+            for bitmap in state.ports[:-1]:
+                state.older_ports |= bitmap
+            for bitmap in state.hosts[:-1]:
+                state.older_hosts |= bitmap
+        
+        port_bit = 1 << (((port * 2654435761) & 0xFFFFFFFF) >> self.shift)
+        host_bit = 1 << (hash(destination) & self.mask)
+        ports = state.ports[-1]
+        hosts = state.hosts[-1]
+        if ports & port_bit and hosts & host_bit:
+            # Nothing new in this bucket, so the window counts are unchanged
+            return None
+        state.ports[-1] = ports | port_bit
+        state.hosts[-1] = hosts | host_bit
+        
+        ports = (state.older_ports | ports | port_bit).bit_count()
+        hosts = (state.older_hosts | hosts | host_bit).bit_count()
+        if ports >= self.port_bits and hosts >= self.host_bits:
+            kind = "block"
+        elif ports >= self.port_bits:
+            kind = "vertical"
+        elif hosts >= self.host_bits:
+            kind = "horizontal"
+        else:
+            return None
+        
+        # A block scan already covers the vertical and horizontal ones
+        for reported in (kind, "block"):
+            last = state.alerted.get(reported)
+            if last is not None and slot - last < self.buckets:
+                return None
+        state.alerted[kind] = slot
+        self.stats[kind] += 1
+        return self._scan_event(kind, event, sketch_count_bits(ports, self.bits), sketch_count_bits(hosts, self.bits))
+
+    def _bits_for(self, threshold):
+        for set_bits in range(self.bits + 1):
+            if sketch_count_bits(set_bits, self.bits) >= threshold:
+                return set_bits
+        return self.bits
+
+    def _scan_event(self, kind, event, distinct_ports, distinct_hosts):
+        window = f"{self.window:g}s"
+        scan = {
+            "type": "scan",
+            "scan_kind": kind,
+            "source": event["source"],
+            "protocol": event.get("protocol"),
+            "distinct_ports": distinct_ports,
+            "distinct_hosts": distinct_hosts,
+            "window": self.window,
+            "timestamp": event.get("timestamp") or datetime.now().isoformat()
+        }
+        if kind == "vertical":
+            scan["destination"] = event["destination"]
+            scan["details"] = f"Vertical port scan: about {distinct_ports} ports on {event['destination']} within {window}"
+        elif kind == "horizontal":
+            scan["destination"] = f"{distinct_hosts} hosts"
+            scan["port"] = event["port"]
+            scan["details"] = f"Horizontal scan (host sweep): about {distinct_hosts} hosts on port {event['port']} within {window}"
+        else:
+            scan["destination"] = f"{distinct_hosts} hosts"
+            scan["details"] = f"Block scan: about {distinct_ports} ports across {distinct_hosts} hosts within {window}"
+        return scan
+
+# Shared by every real traffic source
+scan_detector = ScanDetector() if SCAN_DETECTION else None
+
+class FlowRecord:
+    """
+    Counters of one flow
+    """
+    __slots__ = ("key", "first_seen", "last_seen", "packets", "bytes")
+
+    def __init__(self, key, timestamp):
+        self.key = key
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.packets = 0
+        self.bytes = 0
+
+# Approximate footprint of a flow: record, key tuple, table entry and its
+# reference from the wheel; address strings are shared through the caches
+FLOW_RECORD_BYTES = (
+    sys.getsizeof(FlowRecord(None, 0.0))
+    + sys.getsizeof(("TCP", "", 0, "", 0))
+    + 112
+)
+
+class FlowTable:
+    """
+    Flows keyed by 5-tuple (protocol, source, source port, destination,
+    destination port) with idle and active timeouts
+
+    Expiry is driven by a timer wheel with one slot per tick, covering the
+    longest timeout. A record is filed under the tick of its deadline and
+    is not moved when it is updated; when its slot comes round it either
+    expires or is filed again under its new deadline, so an update costs a
+    dictionary lookup. The table never holds more flows than fit in
+    max_bytes; beyond that the oldest flow is evicted. Time is taken from
+    the events, so captures and logs replay at their own pace; time going
+    back further than the wheel spans starts a new timeline, flushing the
+    flows of the old one.
+    """
+
+    def __init__(
+        self,
+        idle_timeout=FLOW_IDLE_TIMEOUT,
+        active_timeout=FLOW_ACTIVE_TIMEOUT,
+        tick=FLOW_WHEEL_TICK,
+        max_bytes=FLOW_TABLE_MAX_BYTES
+    ):
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.tick = tick
+        self.max_flows = max(1, max_bytes // FLOW_RECORD_BYTES)
+        # key -> FlowRecord, oldest flow first
+        self.flows = OrderedDict()
+        self.wheel = [[] for _ in range(int(math.ceil(max(idle_timeout, active_timeout) / tick)) + 1)]
+        self.current = None
+        self.stats = {"created": 0, "peak_flows": 0}
+        # Flows that left the table, by reason
+        self.expired = {"idle": 0, "active": 0, "evicted": 0, "flushed": 0}
+
+    def update(self, protocol, source, source_port, destination, destination_port, timestamp, packets=1, octets=0):
+        """
+        Account packets and bytes of a flow seen at timestamp (epoch seconds)
+        """
+        if self.current is None or not (self.current - len(self.wheel)) * self.tick <= timestamp < (self.current + 1) * self.tick:
+            self.advance(timestamp)
+        
+        key = (protocol, source, source_port, destination, destination_port)
+        record = self.flows.get(key)
+        if record is None:
+            record = self.flows[key] = FlowRecord(key, timestamp)
+            self.stats["created"] += 1
+            if len(self.flows) > self.max_flows:
+                self.flows.popitem(last=False)
+                self.expired["evicted"] += 1
+            elif len(self.flows) > self.stats["peak_flows"]:
+                self.stats["peak_flows"] = len(self.flows)
+            self._schedule(record)
+        elif timestamp > record.last_seen:
+            record.last_seen = timestamp
+        record.packets += packets
+        record.bytes += octets
+        return record
+
+    def advance(self, now):
+        """
+        Expire the flows whose timeout has passed at now
+        """
+        tick = int(now // self.tick)
+        if self.current is not None and tick < self.current - len(self.wheel):
+            # A new capture or a reset clock: waiting for time to catch up
+            # would stall expiry, so the old timeline's flows end here
+            self.flush()
+        if self.current is None:
+            self.current = tick
+            return
+        if tick <= self.current:
+            return
+        start = self.current
+        self.current = tick
+        # After a jump longer than the wheel every slot is due once
+        for due_tick in range(start + 1, min(tick, start + len(self.wheel)) + 1):
+            index = due_tick % len(self.wheel)
+            due = self.wheel[index]
+            self.wheel[index] = []
+            for record in due:
+                if self.flows.get(record.key) is not record:
+                    # Evicted, or expired and started again, since it was filed
+                    continue
+                if record.last_seen + self.idle_timeout <= now:
+                    self._expire(record, "idle")
+                elif record.first_seen + self.active_timeout <= now:
+                    self._expire(record, "active")
+                else:
+                    self._schedule(record)
+
+    def flush(self):
+        """
+        Expire every flow, as at the end of a capture
+        """
+        self.expired["flushed"] += len(self.flows)
+        self.flows.clear()
+        self.wheel = [[] for _ in self.wheel]
+        self.current = None
+
+    def occupancy(self):
+        """
+        Table size and expiry counters
+        """
+        return dict(
+            self.stats,
+            expired=dict(self.expired),
+            flows=len(self.flows),
+            max_flows=self.max_flows,
+            occupancy=round(len(self.flows) / self.max_flows, 4),
+            approx_bytes=len(self.flows) * FLOW_RECORD_BYTES
+        )
+
+    def _schedule(self, record):
+        deadline = min(record.last_seen + self.idle_timeout, record.first_seen + self.active_timeout)
+        tick = max(int(deadline // self.tick), self.current + 1)
+        self.wheel[tick % len(self.wheel)].append(record)
+
+    def _expire(self, record, reason):
+        del self.flows[record.key]
+        self.expired[reason] += 1
+
+flow_table = FlowTable() if FLOW_TABLE else None
+
+def failed_attempt(event):
+    """
+    Whether an event reports a single failed connection attempt
+    """
+    return event["type"] == "connection" and "failed" in event.get("details", "").lower()
+
+class FailedAttemptState:
+    """
+    Failed attempt counts of one source per second, oldest first
+    """
+    __slots__ = ("buckets", "count", "reported")
+
+    def __init__(self):
+        self.buckets = deque()
+        self.count = 0
+        self.reported = None
+
+class FailedAttemptTracker:
+    """
+    Counts failed connection attempts per source over a sliding window
+
+    A single reset or unanswered SYN is routine, so attempts are only
+    reported in aggregate: once a source makes threshold of them within
+    window seconds of event time, and then not again until a window has
+    passed. Beyond max_sources the least recently active source is evicted.
+    """
+
+    def __init__(
+        self,
+        threshold=FAILED_ATTEMPT_THRESHOLD,
+        window=FAILED_ATTEMPT_WINDOW,
+        max_sources=FAILED_ATTEMPT_MAX_SOURCES
+    ):
+        self.threshold = threshold
+        self.window = window
+        self.max_sources = max_sources
+        # source -> FailedAttemptState, least recently active first
+        self.sources = OrderedDict()
+        self.stats = {"reported": 0, "evicted": 0}
+
+    def observe(self, event):
+        """
+        Account one failed attempt; returns an aggregated failed connection
+        event when the source crosses the threshold, else None
+        """
+        now = event_seconds(event.get("timestamp"))
+        source = event["source"]
+        state = self.sources.get(source)
+        if state is None:
+            state = self.sources[source] = FailedAttemptState()
+            if len(self.sources) > self.max_sources:
+                self.sources.popitem(last=False)
+                self.stats["evicted"] += 1
+        else:
+            self.sources.move_to_end(source)
+        
+        second = int(now)
+        buckets = state.buckets
+        if buckets and buckets[-1][0] == second:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([second, 1])
+        state.count += 1
+        while buckets[0][0] <= second - self.window:
+            state.count -= buckets.popleft()[1]
+        
+        if state.count < self.threshold:
+            return None
+        if state.reported is not None and now - state.reported < self.window:
+            return None
+        state.reported = now
+        self.stats["reported"] += 1
+        window = f"{self.window:g}s"
+        return {
+            "type": "connection",
+            "source": source,
+            "destination": event["destination"],
+            "port": event.get("port"),
+            "protocol": event.get("protocol"),
+            "failed_attempts": state.count,
+            "window": self.window,
+            "details": f"{state.count} failed connection attempts within {window}",
+            "timestamp": event.get("timestamp") or datetime.now().isoformat()
+        }
+
+# Shared by every real traffic source
+failed_attempts = FailedAttemptTracker()
+
+def assess_event(event):
+    """
+    Run detection on one event and raise its alert; returns the number of
+    alerts raised
+    """
+    threat_level = detect_threat(event)
+    if threat_level == "low":
+        return 0
+    create_alert(event, threat_level)
+    return 1
+
+def process_event(event):
+    """
+    Run detection on an event from a real traffic source and raise alerts
+
+    Unlike the simulated loop, events are not logged one by one; at capture
+    rates only the alerts they raise are worth reporting. Connection events
+    also feed the scan detector, whose scan events are assessed in turn,
+    and flow records (which carry their own counters) the flow table.
+    
+    Single failed attempts are only assessed in aggregate, once a source
+    has made many of them. Returns the number of alerts raised, including
+    those for scans and aggregated failures.
+    """
+    if flow_table is not None and "packets" in event:
+        flow_table.update(
+            event["protocol"], event["source"], event.get("source_port"), event["destination"],
+            event["port"], event_seconds(event.get("timestamp")), event["packets"], event["bytes"] or 0
+        )
+    alerts = 0
+    if failed_attempt(event):
+        failures = failed_attempts.observe(event)
+        if failures:
+            alerts += assess_event(failures)
+    else:
+        alerts += assess_event(event)
+    
+    if scan_detector:
+        scan = scan_detector.observe(event)
+        if scan:
+            alerts += assess_event(scan)
+    return alerts
+
+# pcap magic numbers: byte order and timestamp resolution
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9)
+}
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+# Anything larger is treated as corruption rather than buffered
+MAX_CAPTURE_RECORD = 16 * 1024 * 1024
+PCAPNG_INTERFACE_DESCRIPTION = 1
+PCAPNG_SIMPLE_PACKET = 3
+PCAPNG_ENHANCED_PACKET = 6
+# Smallest valid length of each block type: its fixed fields and trailer
+PCAPNG_MIN_BLOCK_LENGTH = {
+    PCAPNG_INTERFACE_DESCRIPTION: 20,
+    PCAPNG_SIMPLE_PACKET: 16,
+    PCAPNG_ENHANCED_PACKET: 32
+}
+
+# Link-layer header types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+# IPv6 extension headers skipped on the way to the transport header
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT_HEADER = 44
+
+_u16 = struct.Struct("!H").unpack_from
+_u32 = struct.Struct("!I").unpack_from
+_ports = struct.Struct("!HH").unpack_from
+
+class CaptureBuffer:
+    """
+    Read buffer over a capture file
+
+    Packets are decoded in place from a memoryview of one large buffer that
+    is refilled with readinto; only the unread tail is moved when a record
+    crosses the end of the buffer.
+    """
+
+    def __init__(self, f, size=CAPTURE_READ_BLOCK_SIZE):
+        self.f = f
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+
+    def ensure(self, size):
+        """
+        Make size bytes available at the read position and return that
+        position, or None if the file ends first
+        """
+        if self.end - self.start >= size:
+            return self.start
+        
+        remaining = self.end - self.start
+        if size > len(self.buf):
+            # A record larger than the buffer: grow it
+            buf = bytearray(max(size, 2 * len(self.buf)))
+            buf[:remaining] = self.view[self.start:self.end]
+            self.buf, self.view = buf, memoryview(buf)
+        else:
+            self.buf[:remaining] = self.view[self.start:self.end].tobytes()
+        self.start, self.end = 0, remaining
+        
+        while self.end < size:
+            read = self.f.readinto(self.view[self.end:])
+            if not read:
+                return None
+            self.end += read
+        return 0
+
+    def consume(self, size):
+        self.start += size
+
+def iter_pcap_records(f):
+    """
+    Yield (timestamp, linktype, buffer, offset, length) for each packet of
+    a classic pcap file
+    """
+    header = f.read(24)
+    if len(header) < 24 or header[:4] not in PCAP_MAGIC:
+        raise ValueError("not a pcap file")
+    byte_order, resolution = PCAP_MAGIC[header[:4]]
+    # The upper bits of the link type may carry FCS information
+    linktype = struct.unpack_from(byte_order + "I", header, 20)[0] & 0x0FFFFFFF
+    record_header = struct.Struct(byte_order + "IIII")
+    
+    reader = CaptureBuffer(f)
+    while True:
+        position = reader.ensure(16)
+        if position is None:
+            return
+        ts_seconds, ts_fraction, captured, original = record_header.unpack_from(reader.buf, position)
+        if captured > MAX_CAPTURE_RECORD:
+            raise ValueError(f"corrupt pcap record of length {captured}")
+        position = reader.ensure(16 + captured)
+        if position is None:
+            # Capture cut off mid-record
+            return
+        reader.consume(16 + captured)
+        yield ts_seconds + ts_fraction * resolution, linktype, reader.view, position + 16, captured
+
+def pcapng_resolution(block, byte_order, start, end):
+    """
+    Timestamp resolution from the if_tsresol option of an interface block
+    """
+    while start + 4 <= end:
+        code, length = struct.unpack_from(byte_order + "HH", block, start)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = block[start + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        start += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+def iter_pcapng_records(f):
+    """
+    Yield (timestamp, linktype, buffer, offset, length) for each packet of
+    a pcapng file
+    """
+    reader = CaptureBuffer(f)
+    byte_order = "<"
+    interfaces = []
+    last_timestamp = None
+    while True:
+        position = reader.ensure(12)
+        if position is None:
+            return
+        buf = reader.buf
+        block_type = struct.unpack_from(byte_order + "I", buf, position)[0]
+        if block_type == PCAPNG_SECTION_HEADER:
+            # Each section declares its own byte order and interfaces
+            byte_order = "<" if buf[position + 8:position + 12] == b"\x4d\x3c\x2b\x1a" else ">"
+            interfaces = []
+        block_length = struct.unpack_from(byte_order + "I", buf, position + 4)[0]
+        if (
+            block_length < PCAPNG_MIN_BLOCK_LENGTH.get(block_type, 12)
+            or block_length % 4
+            or block_length > MAX_CAPTURE_RECORD
+        ):
+            raise ValueError(f"corrupt pcapng block of length {block_length}")
+        
+        position = reader.ensure(block_length)
+        if position is None:
+            return
+        reader.consume(block_length)
+        buf = reader.buf
+        
+        if block_type == PCAPNG_ENHANCED_PACKET:
+            interface, ts_high, ts_low, captured = struct.unpack_from(byte_order + "IIII", buf, position + 8)
+            if captured > block_length - 32:
+                raise ValueError(f"corrupt pcapng packet of length {captured} in a block of length {block_length}")
+            if interface >= len(interfaces):
+                raise ValueError(f"packet for undeclared interface {interface}")
+            linktype, resolution = interfaces[interface]
+            last_timestamp = ((ts_high << 32) | ts_low) * resolution
+            yield last_timestamp, linktype, reader.view, position + 28, captured
+        elif block_type == PCAPNG_SIMPLE_PACKET:
+            original = struct.unpack_from(byte_order + "I", buf, position + 8)[0]
+            if not interfaces:
+                raise ValueError("packet before any interface description")
+            # Simple packet blocks carry no timestamp: keep the capture's own
+            # clock by reusing the previous packet's (None before any)
+            yield last_timestamp, interfaces[0][0], reader.view, position + 12, min(original, block_length - 16)
+        elif block_type == PCAPNG_INTERFACE_DESCRIPTION:
+            linktype = struct.unpack_from(byte_order + "H", buf, position + 8)[0]
+            resolution = pcapng_resolution(buf, byte_order, position + 16, position + block_length - 4)
+            interfaces.append((linktype, resolution))
+
+def iter_capture_records(path):
+    """
+    Stream the packets of a pcap or pcapng file
+
+    The yielded buffer is only valid until the next record is requested.
+    """
+    with open(path, "rb", buffering=0) as f:
+        magic = f.read(4)
+        f.seek(0)
+        if magic in PCAP_MAGIC:
+            yield from iter_pcap_records(f)
+        elif len(magic) == 4 and struct.unpack("<I", magic)[0] == PCAPNG_SECTION_HEADER:
+            yield from iter_pcapng_records(f)
+        else:
+            raise ValueError(f"{path} is not a pcap or pcapng capture")
+
+# Address strings are cached: the same hosts appear over and over
+_ipv4_names = {}
+_ipv6_names = {}
+
+def ipv4_name(buf, offset):
+    number = _u32(buf, offset)[0]
+    name = _ipv4_names.get(number)
+    if name is None:
+        if len(_ipv4_names) >= 65536:
+            _ipv4_names.clear()
+        name = _ipv4_names[number] = socket.inet_ntoa(number.to_bytes(4, "big"))
+    return name
+
+def ipv6_name(buf, offset):
+    packed = bytes(buf[offset:offset + 16])
+    name = _ipv6_names.get(packed)
+    if name is None:
+        if len(_ipv6_names) >= 65536:
+            _ipv6_names.clear()
+        name = _ipv6_names[packed] = socket.inet_ntop(socket.AF_INET6, packed)
+    return name
+
+def dns_query_name(buf, offset, end):
+    """
+    First question name of a DNS query message, or None if it is not a query
+    """
+    if end - offset < 12 or buf[offset + 2] & 0x80 or not _u16(buf, offset + 4)[0]:
+        return None
+    labels = []
+    position = offset + 12
+    while position < end:
+        length = buf[position]
+        if length == 0:
+            break
+        if length & 0xC0 or position + 1 + length > end:
+            # Compression pointers do not occur in the first question
+            return None
+        labels.append(bytes(buf[position + 1:position + 1 + length]).decode("ascii", "replace"))
+        position += 1 + length
+    return ".".join(labels) if labels else None
+
+def decode_packet(timestamp, linktype, buf, offset, length):
+    """
+    Decode the link, IP and transport headers of one packet into a network
+    event, or None if the packet does not make one
+
+    TCP connection attempts (SYN) become traffic events and resets become
+    failed connection events; DNS queries become dns events with the
+    queried name as destination, and other UDP datagrams traffic events.
+    Every timestamped TCP and UDP packet, event or not, is accounted in the
+    flow table.
+    """
+    end = offset + length
+    
+    if linktype == LINKTYPE_ETHERNET:
+        if length < 14:
+            return None
+        ethertype = _u16(buf, offset + 12)[0]
+        offset += 14
+        while ethertype in ETHERTYPE_VLAN and offset + 4 <= end:
+            ethertype = _u16(buf, offset + 2)[0]
+            offset += 4
+    elif linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if length < 1:
+            return None
+        ethertype = ETHERTYPE_IPV4 if buf[offset] >> 4 == 4 else ETHERTYPE_IPV6
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if length < 16:
+            return None
+        ethertype = _u16(buf, offset + 14)[0]
+        offset += 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if length < 20:
+            return None
+        ethertype = _u16(buf, offset)[0]
+        offset += 20
+    elif linktype == LINKTYPE_NULL:
+        if length < 4:
+            return None
+        # Address family in host byte order: AF_INET is 2, AF_INET6 varies
+        family = buf[offset] or buf[offset + 3]
+        ethertype = ETHERTYPE_IPV4 if family == 2 else ETHERTYPE_IPV6
+        offset += 4
+    else:
+        return None
+    
+    ip_offset = offset
+    if ethertype == ETHERTYPE_IPV4:
+        if end - offset < 20:
+            return None
+        header_length = (buf[offset] & 0x0F) * 4
+        if _u16(buf, offset + 6)[0] & 0x1FFF:
+            # Only the first fragment carries the transport header
+            return None
+        protocol = buf[offset + 9]
+        source = ipv4_name(buf, offset + 12)
+        destination = ipv4_name(buf, offset + 16)
+        # Ignore link-layer padding after the IP datagram
+        end = min(end, offset + _u16(buf, offset + 2)[0])
+        offset += header_length
+    elif ethertype == ETHERTYPE_IPV6:
+        if end - offset < 40:
+            return None
+        protocol = buf[offset + 6]
+        source = ipv6_name(buf, offset + 8)
+        destination = ipv6_name(buf, offset + 24)
+        end = min(end, offset + 40 + _u16(buf, offset + 4)[0])
+        offset += 40
+        while protocol in IPV6_EXTENSION_HEADERS or protocol == IPV6_FRAGMENT_HEADER:
+            if end - offset < 8:
+                return None
+            if protocol == IPV6_FRAGMENT_HEADER:
+                if _u16(buf, offset + 2)[0] & 0xFFF8:
+                    return None
+                header_length = 8
+            else:
+                header_length = (buf[offset + 1] + 1) * 8
+            protocol = buf[offset]
+            offset += header_length
+    else:
+        return None
+    
+    if protocol == 6:
+        if end - offset < 20:
+            return None
+        source_port, destination_port = _ports(buf, offset)
+        if flow_table is not None and timestamp is not None:
+            flow_table.update("TCP", source, source_port, destination, destination_port, timestamp, 1, end - ip_offset)
+        flags = buf[offset + 13]
+        if flags & 0x04:
+            # A reset answers the side that tried to connect
+            event = {
+                "type": "connection",
+                "source": destination,
+                "destination": source,
+                "port": source_port,
+                "protocol": "TCP",
+                "details": f"Connection reset by {source} - failed connection attempt"
+            }
+        elif flags & 0x12 == 0x02:
+            event = {
+                "type": "traffic",
+                "source": source,
+                "destination": destination,
+                "port": destination_port,
+                "protocol": "TCP",
+                "details": f"TCP connection attempt to port {destination_port}"
+            }
+        else:
+            return None
+    elif protocol == 17:
+        if end - offset < 8:
+            return None
+        source_port, destination_port = _ports(buf, offset)
+        if flow_table is not None and timestamp is not None:
+            flow_table.update("UDP", source, source_port, destination, destination_port, timestamp, 1, end - ip_offset)
+        if destination_port == 53:
+            name = dns_query_name(buf, offset + 8, end)
+            if name is None:
+                return None
+            event = {
+                "type": "dns",
+                "source": source,
+                "destination": name,
+                "resolver": destination,
+                "port": 53,
+                "protocol": "DNS",
+                "details": f"DNS query for {name}"
+            }
+        elif source_port == 53:
+            # Responses repeat what the query already reported
+            return None
+        else:
+            event = {
+                "type": "traffic",
+                "source": source,
+                "destination": destination,
+                "port": destination_port,
+                "protocol": "UDP",
+                "details": f"UDP traffic to port {destination_port}"
+            }
+    else:
+        return None
+    
+    event["timestamp"] = datetime.fromtimestamp(timestamp).isoformat() if timestamp else datetime.now().isoformat()
+    return event
+
+def iter_capture_events(path, stats=None):
+    """
+    Stream the network events of a capture file, counting packets in stats
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("packets", 0)
+    stats.setdefault("events", 0)
+    for record in iter_capture_records(path):
+        stats["packets"] += 1
+        event = decode_packet(*record)
+        if event:
+            stats["events"] += 1
+            yield event
+
+def analyze_captures(paths):
+    """
+    Run detection over every packet event of the given capture files
+    """
+    for path in paths:
+        stats = {"alerts": 0}
+        started = time.time()
+        try:
+            for event in iter_capture_events(path, stats):
+                stats["alerts"] += process_event(event)
+        except (OSError, ValueError) as e:
+            log_event("error", f"Error reading capture {path}: {str(e)}")
+            continue
+        elapsed = max(time.time() - started, 1e-9)
+        if flow_table is not None:
+            # Flows still open when the capture ends are complete
+            stats["flows"] = flow_table.occupancy()
+            flow_table.flush()
+        log_event(
+            "info",
+            f"Analyzed capture {path}: {stats['packets']} packets, {stats['events']} events, {stats['alerts']} alerts",
+            {"path": path, "seconds": round(elapsed, 3), "packets_per_second": round(stats["packets"] / elapsed), **stats}
+        )
+        output_writer.flush()
+
+def benchmark_capture(path):
+    """
+    Measure capture decoding throughput in packets per second on one file
+    """
+    size = os.path.getsize(path)
+    stats = {}
+    started = time.perf_counter()
+    for event in iter_capture_events(path, stats):
+        pass
+    elapsed = time.perf_counter() - started
+    log_event(
+        "info",
+        f"Decoded {stats['packets']} packets in {elapsed:.2f}s: "
+        f"{stats['packets'] / elapsed:,.0f} packets/s, {size / elapsed / 1e6:.1f} MB/s, {stats['events']} events",
+        {"path": path, "bytes": size, "seconds": elapsed, **stats}
+    )
+    return stats
+
+# Columns each Zeek log type is read for; the rest of a row is never split
+ZEEK_COLUMNS = {
+    "conn": ("ts", "id.orig_h", "id.resp_h", "id.resp_p", "proto", "service", "conn_state"),
+    "dns": ("ts", "id.orig_h", "id.resp_h", "query", "qtype_name")
+}
+ZEEK_UNSET = ("-", "(empty)", "")
+
+# Connection states in which the responder never accepted the connection
+ZEEK_FAILED_STATES = ("S0", "REJ", "RSTOS0", "RSTRH", "SH")
+
+# Suricata event types turned into network events; others are skipped unparsed
+SURICATA_EVENT_TYPES = ("alert", "dns", "flow")
+SURICATA_SEVERITY_LEVELS = {1: "high", 2: "medium", 3: "low"}
+
+def zeek_timestamp(value):
+    """
+    Zeek writes epoch seconds by default and ISO 8601 when configured to
+    """
+    try:
+        return datetime.fromtimestamp(float(value)).isoformat()
+    except (TypeError, ValueError):
+        return value if isinstance(value, str) else datetime.now().isoformat()
+
+def zeek_conn_event(record):
+    proto = (record.get("proto") or "tcp").upper()
+    service = record.get("service")
+    state = record.get("conn_state")
+    port = int(record.get("id.resp_p") or 0)
+    failed = state in ZEEK_FAILED_STATES
+    return {
+        "type": "connection" if failed else "traffic",
+        "source": record.get("id.orig_h"),
+        "destination": record.get("id.resp_h"),
+        "port": port,
+        "protocol": service.upper() if service else proto,
+        "details": f"Failed connection attempt ({state})" if failed else f"{proto} connection to port {port}",
+        "timestamp": zeek_timestamp(record.get("ts"))
+    }
+
+def zeek_dns_event(record):
+    query = record.get("query")
+    if not query:
+        return None
+    return {
+        "type": "dns",
+        "source": record.get("id.orig_h"),
+        "destination": query,
+        "resolver": record.get("id.resp_h"),
+        "port": 53,
+        "protocol": "DNS",
+        "details": f"DNS {record.get('qtype_name') or ''} query for {query}".replace("  ", " "),
+        "timestamp": zeek_timestamp(record.get("ts"))
+    }
+
+ZEEK_EVENT_BUILDERS = {"conn": zeek_conn_event, "dns": zeek_dns_event}
+
+def suricata_event(record):
+    """
+    Network event for one decoded eve.json record, or None
+    """
+    event_type = record.get("event_type")
+    event = {
+        "source": record.get("src_ip"),
+        "destination": record.get("dest_ip"),
+        "port": record.get("dest_port"),
+        "protocol": (record.get("app_proto") or record.get("proto") or "").upper(),
+        "timestamp": record.get("timestamp") or datetime.now().isoformat()
+    }
+    if event_type == "alert":
+        alert = record.get("alert") or {}
+        event.update({
+            "type": "ids",
+            "severity": SURICATA_SEVERITY_LEVELS.get(alert.get("severity"), "medium"),
+            "signature_id": alert.get("signature_id"),
+            "details": f"Suricata alert: {alert.get('signature', 'unknown signature')}"
+        })
+    elif event_type == "dns":
+        dns = record.get("dns") or {}
+        if dns.get("type") not in ("query", "request"):
+            return None
+        # eve.json v3 lists questions under "queries"
+        name = dns.get("rrname") or ((dns.get("queries") or [{}])[0]).get("rrname")
+        if not name:
+            return None
+        event.update({
+            "type": "dns",
+            "destination": name,
+            "resolver": record.get("dest_ip"),
+            "protocol": "DNS",
+            "details": f"DNS query for {name}"
+        })
+    elif event_type == "flow":
+        flow = record.get("flow") or {}
+        failed = record.get("proto") == "TCP" and not flow.get("pkts_toclient")
+        event.update({
+            "type": "connection" if failed else "traffic",
+            "details": "Failed connection attempt (no reply)" if failed else f"{event['protocol']} flow to port {event['port']}"
+        })
+    else:
+        return None
+    return event
+
+def eve_event_type(line):
+    """
+    event_type of an eve.json line, read without decoding the JSON
+    """
+    start = line.find('"event_type":')
+    if start < 0:
+        return None
+    start = line.find('"', start + 13) + 1
+    return line[start:line.find('"', start)] if start else None
+
+class NetworkLogReader:
+    """
+    Turns lines of a Zeek conn/dns log (TSV or JSON) or a Suricata eve.json
+    log into network events
+
+    The format is recognized from the first line. TSV rows are split only
+    up to the last needed column; eve.json lines of unused event types are
+    skipped before any JSON decoding.
+    """
+
+    def __init__(self, path):
+        name = os.path.basename(path)
+        self.kind = next((kind for kind in ZEEK_EVENT_BUILDERS if name.startswith(kind)), None)
+        self.format = None
+        self.separator = "\t"
+        self.indexes = None
+        self.stats = {"records": 0, "events": 0, "malformed": 0}
+
+    def feed(self, line):
+        """
+        Network event for one log line, or None
+        """
+        if self.format is None:
+            stripped = line.lstrip()
+            if not stripped:
+                return None
+            if stripped.startswith("#"):
+                self.format = "zeek-tsv"
+            elif '"event_type"' in stripped:
+                self.format = "suricata"
+            elif stripped.startswith("{"):
+                self.format = "zeek-json"
+            else:
+                # A TSV row seen before any header (a follower joining mid
+                # file) cannot be decoded, and says nothing about the format
+                self.stats["malformed"] += 1
+                return None
+        
+        try:
+            if self.format == "zeek-tsv":
+                event = self._feed_tsv(line)
+            elif self.format == "suricata":
+                if eve_event_type(line) not in SURICATA_EVENT_TYPES:
+                    return None
+                self.stats["records"] += 1
+                event = suricata_event(json.loads(line))
+            else:
+                event = self._feed_zeek_json(line)
+        except (ValueError, TypeError, KeyError, AttributeError, IndexError):
+            self.stats["malformed"] += 1
+            return None
+        if event:
+            self.stats["events"] += 1
+        return event
+
+    def _feed_tsv(self, line):
+        if line.startswith("#"):
+            self._read_header(line.rstrip("\r\n"))
+            return None
+        if not self.indexes:
+            return None
+        self.stats["records"] += 1
+        parts = line.rstrip("\r\n").split(self.separator, self.last_index + 1)
+        record = {}
+        for column, index in self.indexes:
+            value = parts[index]
+            if value not in ZEEK_UNSET:
+                record[column] = value
+        return ZEEK_EVENT_BUILDERS[self.kind](record)
+
+    def _read_header(self, line):
+        if line.startswith("#separator"):
+            self.separator = line.split(" ", 1)[1].encode().decode("unicode_escape")
+            return
+        directive, _, value = line.partition(self.separator)
+        if directive == "#path" and value in ZEEK_EVENT_BUILDERS:
+            self.kind = value
+        elif directive == "#fields" and self.kind:
+            columns = value.split(self.separator)
+            self.indexes = [(column, columns.index(column)) for column in ZEEK_COLUMNS[self.kind] if column in columns]
+            self.last_index = max(index for column, index in self.indexes)
+
+    def _feed_zeek_json(self, line):
+        if not line.strip():
+            return None
+        self.stats["records"] += 1
+        record = json.loads(line)
+        kind = self.kind or ("dns" if "query" in record else "conn" if "conn_state" in record else None)
+        return ZEEK_EVENT_BUILDERS[kind](record) if kind else None
+
+def ingest_network_logs(paths):
+    """
+    Bulk mode: run detection over every record of Zeek or Suricata log files
+    """
+    for path in paths:
+        reader = NetworkLogReader(path)
+        alerts = 0
+        started = time.time()
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    event = reader.feed(line)
+                    if event:
+                        alerts += process_event(event)
+        except OSError as e:
+            log_event("error", f"Error reading network log {path}: {str(e)}")
+            continue
+        elapsed = max(time.time() - started, 1e-9)
+        log_event(
+            "info",
+            f"Ingested {path} ({reader.format}): {reader.stats['records']} records, {reader.stats['events']} events, {alerts} alerts",
+            {"path": path, "format": reader.format, "alerts": alerts, "seconds": round(elapsed, 3),
+             "records_per_second": round(reader.stats["records"] / elapsed), **reader.stats}
+        )
+        output_writer.flush()
+
+def follow_network_logs(paths):
+    """
+    Follow mode: run detection on records as they are appended to the logs
+    """
+    # A Zeek TSV log joined at its end still needs its "#fields" header
+    followed = [
+        (FileTailer(path, NETWORK_FOLLOW_FROM_START, block_size=NETWORK_READ_BLOCK_SIZE, header_prefix=b"#"), NetworkLogReader(path))
+        for path in paths
+    ]
+    log_event("info", f"Following {len(paths)} network log(s): {', '.join(paths)}")
+    while True:
+        busy = False
+        for tailer, reader in followed:
+            for line in tailer.read_lines():
+                busy = True
+                event = reader.feed(line.decode("utf-8", "replace"))
+                if event:
+                    process_event(event)
+        if not busy:
+            output_writer.flush()
+            time.sleep(NETWORK_FOLLOW_INTERVAL)
+
+def benchmark_network_log(path):
+    """
+    Measure log decoding throughput in records per minute on one file
+    """
+    reader = NetworkLogReader(path)
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            reader.feed(line)
+    elapsed = time.perf_counter() - started
+    log_event(
+        "info",
+        f"Decoded {reader.stats['records']} {reader.format} records in {elapsed:.2f}s: "
+        f"{reader.stats['records'] / elapsed * 60:,.0f} records/min, {reader.stats['events']} events",
+        {"path": path, "format": reader.format, "seconds": elapsed, **reader.stats}
+    )
+    return reader.stats
+
+# Information elements events are built from, shared by NetFlow v9 and IPFIX
+FLOW_FIELDS = {
+    8: "source",
+    12: "destination",
+    27: "source",
+    28: "destination",
+    7: "source_port",
+    11: "destination_port",
+    4: "protocol",
+    6: "tcp_flags",
+    2: "packets",
+    1: "bytes"
+}
+# Argument order of flow_event after the timestamp
+FLOW_EVENT_FIELDS = ("source", "destination", "source_port", "destination_port", "protocol", "tcp_flags", "packets", "bytes")
+FLOW_INTEGER_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+FLOW_PROTOCOLS = {6: "TCP", 17: "UDP"}
+FLOW_VARIABLE_LENGTH = 65535
+
+# NetFlow v5 record: addresses, counters, ports, TCP flags and protocol
+NETFLOW_V5_RECORD = struct.Struct("!4s4s8xII8xHHxBBx8x")
+NETFLOW_V5_HEADER = struct.Struct("!HHIII")
+NETFLOW_V9_HEADER = struct.Struct("!HHIIII")
+IPFIX_HEADER = struct.Struct("!HHIII")
+
+_flow_addresses = {}
+
+def flow_address(packed):
+    name = _flow_addresses.get(packed)
+    if name is None:
+        if len(_flow_addresses) >= 65536:
+            _flow_addresses.clear()
+        family = socket.AF_INET if len(packed) == 4 else socket.AF_INET6
+        name = _flow_addresses[packed] = socket.inet_ntop(family, packed)
+    return name
+
+def flow_event(timestamp, source, destination, source_port, destination_port, protocol, tcp_flags, packets, octets):
+    """
+    Network event for one flow record, or None for flows other than TCP and UDP
+
+    A TCP flow that carried a SYN but never an ACK is a connection attempt
+    nobody answered and becomes a failed connection event.
+    """
+    name = FLOW_PROTOCOLS.get(protocol)
+    if name is None or source is None or destination is None:
+        return None
+    source = flow_address(source)
+    destination = flow_address(destination)
+    if protocol == 6 and tcp_flags is not None and tcp_flags & 0x12 == 0x02:
+        return {
+            "type": "connection",
+            "source": source,
+            "destination": destination,
+            "source_port": source_port,
+            "port": destination_port,
+            "protocol": name,
+            "details": f"Unanswered connection attempt to port {destination_port} - failed connection attempt",
+            "packets": packets,
+            "bytes": octets,
+            "timestamp": timestamp
+        }
+    return {
+        "type": "traffic",
+        "source": source,
+        "destination": destination,
+        "source_port": source_port,
+        "port": destination_port,
+        "protocol": name,
+        "details": f"{name} flow to port {destination_port}: {packets} packets, {octets} bytes",
+        "packets": packets,
+        "bytes": octets,
+        "timestamp": timestamp
+    }
+
+class FlowTemplate:
+    """
+    A NetFlow v9 or IPFIX template compiled into a struct layout
+
+    Only the fields in FLOW_FIELDS are unpacked; everything else in a record
+    is skipped as padding. Templates with variable-length fields, which only
+    IPFIX has, are walked field by field instead.
+    """
+
+    def __init__(self, fields, options=False):
+        self.fields = fields
+        self.options = options
+        self.struct = None
+        positions = {}
+        layout = ["!"]
+        wanted = []
+        for element, length in fields:
+            name = None if options else FLOW_FIELDS.get(element)
+            if name in ("source", "destination"):
+                code = f"{length}s" if length in (4, 16) else None
+            else:
+                code = FLOW_INTEGER_FORMATS.get(length) if name else None
+            if code and name not in positions:
+                positions[name] = len(wanted)
+                wanted.append((element, length))
+                layout.append(code)
+            else:
+                layout.append(f"{length}x")
+        
+        self.wanted = set(wanted)
+        # Missing fields read the None appended to every record
+        self.getter = itemgetter(*(positions.get(name, len(wanted)) for name in FLOW_EVENT_FIELDS))
+        if not any(length == FLOW_VARIABLE_LENGTH for element, length in fields):
+            self.struct = struct.Struct("".join(layout))
+
+    def records(self, data, start, end):
+        """
+        Values of the wanted fields of each record in a data set
+        """
+        if self.struct is not None:
+            size = self.struct.size
+            if not size:
+                return []
+            # Trailing padding shorter than a record is ignored
+            end = start + (end - start) // size * size
+            return self.struct.iter_unpack(data[start:end])
+        return self._variable_records(data, start, end)
+
+    def _variable_records(self, data, start, end):
+        position = start
+        while position < end:
+            values = []
+            for element, length in self.fields:
+                if length == FLOW_VARIABLE_LENGTH:
+                    if position >= end:
+                        return
+                    length = data[position]
+                    position += 1
+                    if length == 255:
+                        length = _u16(data, position)[0]
+                        position += 2
+                if position + length > end:
+                    return
+                if (element, length) in self.wanted:
+                    value = bytes(data[position:position + length])
+                    values.append(value if FLOW_FIELDS[element] in ("source", "destination") else int.from_bytes(value, "big"))
+                position += length
+            yield tuple(values)
+
+class NetFlowProtocol(asyncio.DatagramProtocol):
+    """
+    Hands every export packet to the collector queue without decoding it
+    """
+    
+    def __init__(self, collector):
+        self.collector = collector
+    
+    def connection_made(self, transport):
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            self.collector.udp_inodes.add(os.fstat(sock.fileno()).st_ino)
+            # A larger kernel buffer absorbs export bursts while the queue drains
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+            except OSError:
+                pass
+    
+    def datagram_received(self, data, addr):
+        self.collector.enqueue(data, addr[0])
+
+class NetFlowCollector:
+    """
+    Asyncio collector for NetFlow v5, NetFlow v9 and IPFIX export packets
+
+    Templates are cached per exporter address and observation domain (the
+    v9 source id). Data sets that arrive before their template cannot be
+    decoded and are counted as template misses. Packets are decoded in
+    batches off the socket callback; the events of a batch are handed to
+    on_events together. Packets arriving while the queue is full are dropped
+    and counted, alongside the datagrams the kernel dropped on the socket.
+    """
+    
+    BATCH_SIZE = 64
+    
+    def __init__(self, queue_size=NETFLOW_QUEUE_SIZE, on_events=None):
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.on_events = on_events or self.process_events
+        self.ready = None
+        self.udp_inodes = set()
+        self.templates = {}
+        self.stats = {
+            "packets": 0, "flows": 0, "events": 0, "dropped": 0,
+            "malformed": 0, "template_misses": 0, "templates": 0
+        }
+    
+    def enqueue(self, data, exporter):
+        self.stats["packets"] += 1
+        if len(self.queue) >= self.queue_size:
+            self.stats["dropped"] += 1
+            return
+        self.queue.append((data, exporter))
+        if not self.ready.is_set():
+            self.ready.set()
+    
+    def process_events(self, events):
+        for event in events:
+            process_event(event)
+    
+    def decode(self, data, exporter, events):
+        """
+        Append the events of one export packet to events
+        """
+        if len(data) < 4:
+            self.stats["malformed"] += 1
+            return
+        version = _u16(data, 0)[0]
+        try:
+            if version == 5:
+                self._decode_v5(data, events)
+            elif version == 9:
+                self._decode_sets(data, exporter, events, ipfix=False)
+            elif version == 10:
+                self._decode_sets(data, exporter, events, ipfix=True)
+            else:
+                self.stats["malformed"] += 1
+        except struct.error:
+            self.stats["malformed"] += 1
+    
+    def _decode_v5(self, data, events):
+        version, count, uptime, unix_secs, unix_nsecs = NETFLOW_V5_HEADER.unpack_from(data)
+        end = 24 + count * NETFLOW_V5_RECORD.size
+        if end > len(data):
+            self.stats["malformed"] += 1
+            return
+        timestamp = datetime.fromtimestamp(unix_secs).isoformat()
+        for source, destination, packets, octets, source_port, destination_port, tcp_flags, protocol in NETFLOW_V5_RECORD.iter_unpack(data[24:end]):
+            event = flow_event(timestamp, source, destination, source_port, destination_port, protocol, tcp_flags, packets, octets)
+            if event:
+                events.append(event)
+        self.stats["flows"] += count
+    
+    def _decode_sets(self, data, exporter, events, ipfix):
+        if ipfix:
+            version, length, export_time, sequence, domain = IPFIX_HEADER.unpack_from(data)
+            position = IPFIX_HEADER.size
+            end = min(length, len(data))
+            template_sets, options_sets = (2,), (3,)
+        else:
+            version, count, uptime, export_time, sequence, domain = NETFLOW_V9_HEADER.unpack_from(data)
+            position = NETFLOW_V9_HEADER.size
+            end = len(data)
+            template_sets, options_sets = (0,), (1,)
+        
+        templates = self.templates.setdefault(exporter, {})
+        timestamp = datetime.fromtimestamp(export_time).isoformat()
+        while position + 4 <= end:
+            set_id, set_length = _ports(data, position)
+            if set_length < 4 or position + set_length > end:
+                self.stats["malformed"] += 1
+                return
+            body, set_end = position + 4, position + set_length
+            position = set_end
+            
+            if set_id in template_sets or set_id in options_sets:
+                self._read_templates(templates, domain, data, body, set_end, ipfix, set_id in options_sets)
+                continue
+            if set_id < 256:
+                continue
+            template = templates.get((domain, set_id))
+            if template is None:
+                self.stats["template_misses"] += 1
+                continue
+            if template.options:
+                continue
+            
+            getter = template.getter
+            flows = 0
+            for values in template.records(data, body, set_end):
+                flows += 1
+                event = flow_event(timestamp, *getter(values + (None,)))
+                if event:
+                    events.append(event)
+            self.stats["flows"] += flows
+    
+    def _read_templates(self, templates, domain, data, position, end, ipfix, options):
+        while position + 4 <= end:
+            template_id, field_count = _ports(data, position)
+            position += 4
+            if template_id < 256:
+                # Padding at the end of the set
+                return
+            if options:
+                if ipfix:
+                    # The scope field count is part of field_count
+                    position += 2
+                else:
+                    # v9 gives scope and option lengths in bytes, four per field
+                    field_count = (field_count + _u16(data, position)[0]) // 4
+                    position += 2
+            if ipfix and field_count == 0:
+                # Template withdrawal
+                if templates.pop((domain, template_id), None):
+                    self.stats["templates"] -= 1
+                continue
+            
+            fields = []
+            for _ in range(field_count):
+                if position + 4 > end:
+                    self.stats["malformed"] += 1
+                    return
+                element, length = _ports(data, position)
+                position += 4
+                if ipfix and element & 0x8000:
+                    # Enterprise-specific element: skip its enterprise number
+                    element = None
+                    position += 4
+                fields.append((element, length))
+            if (domain, template_id) not in templates:
+                self.stats["templates"] += 1
+            templates[(domain, template_id)] = FlowTemplate(fields, options)
+    
+    async def _consume(self):
+        queue = self.queue
+        while True:
+            if not queue:
+                output_writer.flush()
+                self.ready.clear()
+                await self.ready.wait()
+            
+            events = []
+            for _ in range(min(len(queue), self.BATCH_SIZE)):
+                data, exporter = queue.popleft()
+                self.decode(data, exporter, events)
+            self.stats["events"] += len(events)
+            try:
+                self.on_events(events)
+            except Exception as e:
+                log_event("error", f"Error processing flow events: {str(e)}")
+            await asyncio.sleep(0)
+    
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(NETFLOW_STATS_INTERVAL)
+            kernel_dropped = udp_kernel_drops(self.udp_inodes)
+            metadata = dict(self.stats, kernel_dropped=kernel_dropped, queued=len(self.queue))
+            if flow_table is not None:
+                metadata["flow_table"] = flow_table.occupancy()
+            log_event(
+                "info",
+                f"Flow collector: {self.stats['flows']} flows in {self.stats['packets']} packets, "
+                f"{self.stats['dropped'] + kernel_dropped} packets dropped, {self.stats['template_misses']} template misses",
+                metadata
+            )
+    
+    async def serve(self, host, port):
+        """
+        Listen for export packets until cancelled
+        """
+        loop = asyncio.get_running_loop()
+        self.ready = asyncio.Event()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: NetFlowProtocol(self), local_addr=(host, port)
+        )
+        log_event("info", f"Flow collector listening on {host}:{port} (NetFlow v5/v9, IPFIX)")
+        
+        try:
+            await asyncio.gather(self._consume(), self._report_stats())
+        finally:
+            transport.close()
+
+def sample_export_packets(version, flows_per_packet=30):
+    """
+    One template packet (None for v5) and one data packet of synthetic flows
+    """
+    now = int(time.time())
+    records = [
+        (bytes((10, 0, i // 256 % 256, i % 256)), bytes((192, 168, 1, i % 200)), 40000 + i, (80, 443, 22, 53)[i % 4],
+         6 if i % 4 != 3 else 17, 0x1B if i % 10 else 0x02, 10 + i % 7, 1500 + i)
+        for i in range(flows_per_packet)
+    ]
+    if version == 5:
+        body = b"".join(
+            struct.pack("!4s4s4sHHIIIIHHBBBBHHBBH", src, dst, bytes(4), 0, 0, packets, octets, 0, 0, sport, dport, 0, flags, proto, 0, 0, 0, 0, 0, 0)
+            for src, dst, sport, dport, proto, flags, packets, octets in records
+        )
+        return None, struct.pack("!HHIIIIBBH", 5, len(records), 0, now, 0, 0, 0, 0, 0) + body
+    
+    # Template 256: src, dst, sport, dport, proto, flags, packets, bytes, plus two fields nobody reads
+    fields = [(8, 4), (12, 4), (7, 2), (11, 2), (4, 1), (6, 1), (2, 4), (1, 8), (10, 4), (14, 4)]
+    template = struct.pack("!HH", 256, len(fields)) + b"".join(struct.pack("!HH", *field) for field in fields)
+    body = b"".join(
+        struct.pack("!4s4sHHBBIQII", src, dst, sport, dport, proto, flags, packets, octets, 1, 2)
+        for src, dst, sport, dport, proto, flags, packets, octets in records
+    )
+    template_id, data_id = (2, 256)
+    if version == 9:
+        template_id = 0
+    sets = [struct.pack("!HH", template_id, 4 + len(template)) + template, struct.pack("!HH", data_id, 4 + len(body)) + body]
+    packets = []
+    for content in sets:
+        if version == 9:
+            packets.append(struct.pack("!HHIIII", 9, 1, 0, now, 0, 1) + content)
+        else:
+            packets.append(struct.pack("!HHIII", 10, 16 + len(content), now, 0, 1) + content)
+    return packets[0], packets[1]
+
+def benchmark_netflow(packets=20000, flows_per_packet=30):
+    """
+    Measure collector throughput in flows per second, decoding and running
+    detection on synthetic NetFlow v5, v9 and IPFIX packets
+    """
+    results = {}
+    for version in (5, 9, 10):
+        template, data = sample_export_packets(version, flows_per_packet)
+        collector = NetFlowCollector()
+        events = []
+        if template:
+            collector.decode(template, "192.0.2.1", events)
+        started = time.perf_counter()
+        for _ in range(packets // collector.BATCH_SIZE):
+            events = []
+            for _ in range(collector.BATCH_SIZE):
+                collector.decode(data, "192.0.2.1", events)
+            collector.stats["events"] += len(events)
+            collector.process_events(events)
+        elapsed = time.perf_counter() - started
+        results[version] = round(collector.stats["flows"] / elapsed)
+        log_event(
+            "info",
+            f"NetFlow {'IPFIX' if version == 10 else f'v{version}'}: {collector.stats['flows']} flows in {elapsed:.2f}s, "
+            f"{collector.stats['flows'] / elapsed:,.0f} flows/s",
+            dict(collector.stats, seconds=elapsed)
+        )
+        output_writer.flush()
+    return results
 
 def monitor_network():
     """
@@ -171,6 +1841,18 @@ def monitor_network():
     log_event("info", f"Network monitoring started - Agent {AGENT_NAME} (ID: {AGENT_ID})")
     
     try:
+        if NETWORK_CAPTURE_FILES:
+            analyze_captures(NETWORK_CAPTURE_FILES)
+            return
+        
+        if NETWORK_LOG_FILES:
+            follow_network_logs(NETWORK_LOG_FILES)
+            return
+        
+        if NETFLOW_PORT:
+            asyncio.run(NetFlowCollector().serve(NETFLOW_HOST, NETFLOW_PORT))
+            return
+        
         while True:
             # In a real implementation, this would analyze actual network traffic
             # For simulation, we randomly select a network event
@@ -194,6 +1876,8 @@ def monitor_network():
             if threat_level != "low":
                 create_alert(event, threat_level)
             
+            output_writer.flush()
+            
             # Sleep between 30-60 seconds to simulate monitoring interval
             wait_time = random.randint(30, 60)
             time.sleep(wait_time)
@@ -203,8 +1887,35 @@ def monitor_network():
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ATRO-Lite network monitor agent")
+    parser.add_argument("--capture", nargs="+", metavar="PATH", help="analyze pcap/pcapng captures and exit")
+    parser.add_argument("--ingest", nargs="+", metavar="PATH", help="analyze Zeek conn/dns logs or Suricata eve.json files and exit")
+    parser.add_argument("--follow", nargs="+", metavar="PATH", help="follow Zeek or Suricata logs as they grow")
+    parser.add_argument("--netflow", type=int, metavar="PORT", help="collect NetFlow v5/v9 and IPFIX exports on a UDP port")
+    parser.add_argument("--benchmark", metavar="FILE", help="measure decoding throughput of a capture or network log FILE")
+    parser.add_argument("--benchmark-netflow", type=int, metavar="PACKETS", help="measure flow collector throughput on synthetic export packets")
+    args = parser.parse_args()
+    
     try:
-        monitor_network()
+        if args.benchmark_netflow:
+            benchmark_netflow(args.benchmark_netflow)
+        elif args.benchmark:
+            with open(args.benchmark, "rb") as f:
+                magic = f.read(4)
+            if magic in PCAP_MAGIC or magic == b"\x0a\x0d\x0d\x0a":
+                benchmark_capture(args.benchmark)
+            else:
+                benchmark_network_log(args.benchmark)
+        elif args.capture:
+            analyze_captures(args.capture)
+        elif args.ingest:
+            ingest_network_logs(args.ingest)
+        elif args.follow:
+            follow_network_logs(args.follow)
+        elif args.netflow:
+            asyncio.run(NetFlowCollector().serve(NETFLOW_HOST, args.netflow))
+        else:
+            monitor_network()
     except KeyboardInterrupt:
         print("Network monitoring stopped")
     except Exception as e:
@@ -7,31 +7,103 @@ In a production environment, this would implement actual mitigation actions
 like firewall rule changes, system isolation, etc.
 """
 
+import argparse
+import atexit
+import heapq
+import ipaddress
 import json
 import os
 import random
 import redis
+import shlex
 import signal
+import subprocess
 import sys
+import tempfile
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from agent_output import RecordWriter
+from mcp_streams import THREAT_CHANNELS, StreamConsumer, stream_for_channel
+from mcp_writer import MCPWriter
+
 # Configuration from environment
 AGENT_ID = os.environ.get('AGENT_ID', '0')
 AGENT_NAME = os.environ.get('AGENT_NAME', 'Response Agent')
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
 
+# Response agents sharing a consumer group split the threat streams between
+# them; the consumer name must be stable to recover pending threats on restart
+RESPONSE_GROUP = os.environ.get('RESPONSE_GROUP', 'response-agents')
+RESPONSE_CONSUMER = os.environ.get('RESPONSE_CONSUMER', f"response-agent-{AGENT_ID}")
+
+# Threats are handled most severe first, then oldest first
+SEVERITY_RANK = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Pending response tasks kept locally; beyond this the least urgent are shed
+RESPONSE_QUEUE_SIZE = int(os.environ.get('RESPONSE_QUEUE_SIZE', '10000'))
+
+# Actions run in parallel across targets, one at a time per target
+RESPONSE_CONCURRENCY = int(os.environ.get('RESPONSE_CONCURRENCY', '8'))
+
+# Seconds an action may run unless it sets its own "timeout"
+RESPONSE_ACTION_TIMEOUT = float(os.environ.get('RESPONSE_ACTION_TIMEOUT', '30'))
+
+# How actions are carried out: simulated, dry-run or shell
+RESPONSE_BACKEND = os.environ.get('RESPONSE_BACKEND', 'simulated')
+
+# Batch firewall blocks into one set update per window instead of one
+# command per address
+RESPONSE_FIREWALL_BATCHING = os.environ.get('RESPONSE_FIREWALL_BATCHING', 'false').lower() == 'true'
+RESPONSE_FIREWALL_BATCH_WINDOW = float(os.environ.get('RESPONSE_FIREWALL_BATCH_WINDOW', '0.2'))
+RESPONSE_FIREWALL_BATCH_MAX = int(os.environ.get('RESPONSE_FIREWALL_BATCH_MAX', '1000'))
+
+# nftables table holding the block sets. The sets are expected to exist,
+# referenced by drop rules, e.g. for IPv4:
+#   nft add set inet filter atro_blocked_ips '{ type ipv4_addr; }'
+#   nft add set inet filter atro_blocked_ports '{ type ipv4_addr . inet_service; }'
+# and the same with an "6" suffix and ipv6_addr for IPv6
+RESPONSE_NFT_TABLE = os.environ.get('RESPONSE_NFT_TABLE', 'inet filter')
+
+# Set each batchable action adds to
+FIREWALL_SETS = {
+    "Block Malicious IP": "atro_blocked_ips",
+    "Update Firewall Rules": "atro_blocked_ports"
+}
+
+# Detection-to-action latency the benchmark checks against, in milliseconds
+RESPONSE_LATENCY_TARGET_MS = float(os.environ.get('RESPONSE_LATENCY_TARGET_MS', '100'))
+
+# Seconds an action on an entity stays in effect before it is reverted
+# (0 keeps it until removed by hand)
+RESPONSE_BLOCK_TTL = float(os.environ.get('RESPONSE_BLOCK_TTL', '3600'))
+
+# The registry of actions in effect is kept in a Redis hash shared by all
+# response agents ("redis") or in a local file of this agent ("file")
+RESPONSE_REGISTRY_STORE = os.environ.get('RESPONSE_REGISTRY_STORE', 'redis')
+RESPONSE_REGISTRY_KEY = os.environ.get('RESPONSE_REGISTRY_KEY', 'mcp:response:registry')
+RESPONSE_REGISTRY_FILE = os.environ.get(
+    'RESPONSE_REGISTRY_FILE',
+    os.path.join(tempfile.gettempdir(), f"atro-response-agent-{AGENT_ID}.registry.json")
+)
+RESPONSE_REGISTRY_INTERVAL = float(os.environ.get('RESPONSE_REGISTRY_INTERVAL', '5'))
+
 # Sample response actions
 RESPONSE_ACTIONS = [
     {
         "name": "Block Malicious IP",
         "command": "iptables -A INPUT -s {ip} -j DROP",
+        "revert": "iptables -D INPUT -s {ip} -j DROP",
         "description": "Block incoming traffic from malicious IP",
         "requires": ["ip"]
     },
     {
         "name": "Isolate Compromised Endpoint",
         "command": "networkctl isolate {interface}",
+        "revert": "networkctl reconnect {interface}",
         "description": "Isolate a compromised endpoint from the network",
         "requires": ["interface"]
     },
@@ -45,11 +117,13 @@ RESPONSE_ACTIONS = [
         "name": "Backup Critical Data",
         "command": "rsync -az {source} {backup_location}",
         "description": "Backup critical data to secure location",
-        "requires": ["source", "backup_location"]
+        "requires": ["source", "backup_location"],
+        "timeout": 600
     },
     {
         "name": "Update Firewall Rules",
         "command": "ufw deny from {ip} to any port {port}",
+        "revert": "ufw delete deny from {ip} to any port {port}",
         "description": "Update firewall to block traffic on specific port",
         "requires": ["ip", "port"]
     }
@@ -64,6 +138,28 @@ except Exception as e:
     print(f"Error connecting to Redis: {e}")
     redis_client = None
 
+# At-least-once delivery of threats from the MCP streams
+threat_consumer = None
+if redis_client:
+    try:
+        threat_consumer = StreamConsumer(
+            redis_client,
+            [stream_for_channel(channel) for channel in THREAT_CHANNELS],
+            RESPONSE_GROUP,
+            RESPONSE_CONSUMER
+        )
+    except Exception as e:
+        print(f"Error joining MCP threat streams: {e}")
+
+# Sequence-numbered NDJSON output to the Node.js process
+output_writer = RecordWriter()
+
+# Batched SET+PUBLISH of shared context
+mcp_writer = MCPWriter(
+    redis_client,
+    on_error=lambda e: log_event("error", f"Error sharing response context with MCP: {str(e)}")
+) if redis_client else None
+
 # Signal handlers for graceful shutdown
 def handle_signal(signum, frame):
     print(f"Received signal {signum}, shutting down...")
@@ -82,39 +178,755 @@ def log_event(level, message, metadata=None):
         "message": message,
         "metadata": metadata or {}
     }
-    print(json.dumps(log_data))
+    output_writer.write(log_data)
 
-def get_threat_context():
+def read_threats(consumer):
     """
-    Get threat context from MCP to inform response actions
+    Read the next threats delivered to this agent from the MCP streams
     """
-    if not redis_client:
-        return None
-    
     try:
-        # Get network threats
-        network_threat = redis_client.get("mcp:context:network:connection")
-        if network_threat:
-            return json.loads(network_threat)
-        
-        # Get log threats
-        log_threat = redis_client.get("mcp:context:log:Auth Logs")
-        if log_threat:
-            return json.loads(log_threat)
-        
-        return None
+        return consumer.read()
     except Exception as e:
-        log_event("error", f"Error getting threat context from MCP: {str(e)}")
+        log_event("error", f"Error reading threat context from MCP: {str(e)}")
+        # Back off instead of spinning while Redis is unavailable
+        time.sleep(5)
+        return []
+
+def threat_severity(threat_context):
+    """
+    Severity of a threat: network threats carry threat_level, log alerts severity
+    """
+    severity = threat_context.get("threat_level") or threat_context.get("severity")
+    return severity if severity in SEVERITY_RANK else "medium"
+
+def detection_time(threat_context, entry_id=None):
+    """
+    Epoch time at which a threat was detected
+    """
+    try:
+        return datetime.fromisoformat(threat_context["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        pass
+    if entry_id:
+        # Stream entry ids start with the millisecond time they were added
+        return int(entry_id.split("-")[0]) / 1000
+    return time.time()
+
+class ThreatQueue:
+    """
+    Thread-safe, bounded priority queue of response tasks, ordered by
+    (severity, detection time)
+
+    A task is a dict with "key" (action, target), "severity", "detected_at"
+    and "deliveries", the stream entries to acknowledge once it has run.
+    Tasks with the same key are coalesced into one that keeps the most
+    urgent severity and the earliest detection time. When the queue is full
+    the least urgent task is shed and counted.
+    """
+
+    def __init__(self, max_size=RESPONSE_QUEUE_SIZE):
+        self.max_size = max_size
+        self.tasks = {}
+        # Heap entries go stale when a task is coalesced or removed; they are
+        # skipped lazily and compacted when they pile up
+        self.heap = []
+        self.shed_heap = []
+        self.counter = 0
+        self.ready = threading.Condition()
+        self.stats = {"queued": 0, "coalesced": 0, "shed": 0}
+        self.shed_by_severity = {severity: 0 for severity in SEVERITY_RANK}
+
+    def put(self, task):
+        """
+        Queue a task, returning the tasks shed to make room for it
+        """
+        with self.ready:
+            queued = self.tasks.get(task["key"])
+            if queued:
+                self._coalesce(queued, task)
+                return []
+            
+            shed = []
+            if len(self.tasks) >= self.max_size:
+                lowest = self._peek(self.shed_heap)
+                if self._priority(task) >= self._priority(lowest):
+                    shed.append(task)
+                else:
+                    del self.tasks[lowest["key"]]
+                    shed.append(lowest)
+                for dropped in shed:
+                    self.stats["shed"] += 1
+                    self.shed_by_severity[dropped["severity"]] += 1
+                if shed[0] is task:
+                    return shed
+            
+            self.tasks[task["key"]] = task
+            self.stats["queued"] += 1
+            self._push(task)
+            self.ready.notify()
+            return shed
+
+    def get(self, timeout=None):
+        """
+        Remove and return the most urgent task, or None if nothing arrives
+        within timeout
+        """
+        with self.ready:
+            if not self.tasks and not self.ready.wait_for(lambda: self.tasks, timeout):
+                return None
+            task = self._peek(self.heap)
+            del self.tasks[task["key"]]
+            self._compact()
+            return task
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def _priority(self, task):
+        return (SEVERITY_RANK[task["severity"]], task["detected_at"])
+
+    def _coalesce(self, queued, task):
+        self.stats["coalesced"] += 1
+        queued["deliveries"].extend(task["deliveries"])
+        priority = self._priority(queued)
+        queued["severity"] = min(queued["severity"], task["severity"], key=SEVERITY_RANK.get)
+        queued["detected_at"] = min(queued["detected_at"], task["detected_at"])
+        if self._priority(queued) != priority:
+            # Re-push under the new priority; the old heap entries go stale
+            self._push(queued)
+            self._compact()
+
+    def _push(self, task):
+        self.counter += 1
+        task["counter"] = self.counter
+        rank, detected_at = self._priority(task)
+        heapq.heappush(self.heap, (rank, detected_at, self.counter, task["key"]))
+        heapq.heappush(self.shed_heap, (-rank, -detected_at, -self.counter, task["key"]))
+
+    def _peek(self, heap):
+        """
+        Top live task of one of the heaps, dropping stale entries on the way
+        """
+        while True:
+            counter, key = abs(heap[0][2]), heap[0][3]
+            task = self.tasks.get(key)
+            if task and task["counter"] == counter:
+                return task
+            heapq.heappop(heap)
+
+    def _compact(self):
+        if len(self.heap) + len(self.shed_heap) > 4 * len(self.tasks) + 64:
+            self.heap = [(SEVERITY_RANK[t["severity"]], t["detected_at"], t["counter"], k) for k, t in self.tasks.items()]
+            self.shed_heap = [(-rank, -detected_at, -counter, k) for rank, detected_at, counter, k in self.heap]
+            heapq.heapify(self.heap)
+            heapq.heapify(self.shed_heap)
+
+def response_task(threat_context, deliveries=()):
+    """
+    Build the queued task for a threat, or None if it needs no action
+    """
+    selected = select_response_action(threat_context)
+    if not selected:
         return None
+    action, params = selected
+    return {
+        # Values of the parameters the action requires identify its target
+        "key": (action["name"], ":".join(str(params[param]) for param in action["requires"])),
+        "action": action,
+        "params": params,
+        "severity": threat_severity(threat_context),
+        "detected_at": detection_time(threat_context, deliveries[0][1] if deliveries else None),
+        "deliveries": list(deliveries)
+    }
+
+def acknowledge(consumer, deliveries):
+    """
+    Acknowledge stream entries; an entry whose ack fails stays pending and
+    is redelivered later, so the error is only logged
+    """
+    if consumer:
+        for stream, entry_id in deliveries:
+            try:
+                consumer.ack(stream, entry_id)
+            except Exception as e:
+                log_event("error", f"Error acknowledging {stream} entry {entry_id}: {str(e)}")
 
-def execute_response_action(threat_context):
+def ingest_threats(consumer, queue):
     """
-    Execute an appropriate response action based on the threat context
-    In a real implementation, this would execute actual commands
+    Move threats from the MCP streams into the local queue as they arrive
+    """
+    while True:
+        try:
+            shed = []
+            for stream, entry_id, threat_context in read_threats(consumer):
+                task = response_task(threat_context, [(stream, entry_id)])
+                if task:
+                    shed.extend(queue.put(task))
+                else:
+                    acknowledge(consumer, [(stream, entry_id)])
+            if shed:
+                # Shed threats are dropped for good rather than redelivered
+                for task in shed:
+                    acknowledge(consumer, task["deliveries"])
+                log_event(
+                    "warning",
+                    f"Response queue full, shed {len(shed)} lower-priority task(s)",
+                    {"shed_total": queue.stats["shed"], "shed_by_severity": dict(queue.shed_by_severity)}
+                )
+        except Exception as e:
+            # The ingest thread must outlive any single bad batch
+            log_event("error", f"Error ingesting threats: {str(e)}")
+            time.sleep(5)
+
+def start_ingest(consumer, queue):
+    thread = threading.Thread(target=ingest_threats, args=(consumer, queue), name="threat-ingest", daemon=True)
+    thread.start()
+    return thread
+
+def response_target(params):
+    """
+    Host, user or resource an action operates on; actions on the same
+    target never run concurrently
+    """
+    for param in ("ip", "username", "interface", "source"):
+        if param in params:
+            return f"{param}:{params[param]}"
+    return None
+
+class SimulatedBackend:
+    """
+    Pretends to run commands, taking as long as a real action might
+    """
+
+    def run(self, command, timeout):
+        delay = random.uniform(0.5, 2.0)
+        if delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"timed out after {timeout:g}s")
+        time.sleep(delay)
+        return ""
+
+class DryRunBackend:
+    """
+    Records commands instead of running them, optionally taking a fixed
+    time per command to model its cost
+    """
+
+    def __init__(self, latency=0.0, history=10000):
+        self.latency = latency
+        self.commands = deque(maxlen=history)
+
+    def run(self, command, timeout):
+        if self.latency:
+            time.sleep(min(self.latency, timeout))
+            if self.latency > timeout:
+                raise TimeoutError(f"timed out after {timeout:g}s")
+        self.commands.append(command)
+        return ""
+
+class ShellBackend:
+    """
+    Runs commands for real, killing them when they exceed their timeout
+    """
+
+    def run(self, command, timeout):
+        try:
+            result = subprocess.run(shlex.split(command), capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"timed out after {timeout:g}s")
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"exit status {result.returncode}")
+        return result.stdout
+
+RESPONSE_BACKENDS = {
+    "simulated": SimulatedBackend,
+    "dry-run": DryRunBackend,
+    "shell": ShellBackend
+}
+
+def firewall_element(params):
+    """
+    nft set element for a firewall task's parameters and whether it is IPv6
+
+    Addresses and ports are validated, as they end up in nft syntax.
+    """
+    address = ipaddress.ip_address(str(params["ip"]))
+    if "port" in params:
+        port = int(params["port"])
+        if not 0 < port < 65536:
+            raise ValueError(f"invalid port {port}")
+        return f"{address} . {port}", address.version == 6
+    return str(address), address.version == 6
+
+class FirewallBatcher:
+    """
+    Collects firewall block tasks for up to window seconds and applies each
+    block set with a single "nft add element" listing every address
+
+    Tasks blocking an address already in the batch are merged into it. Each
+    batch is logged with its size and every task in it is acknowledged once
+    the update has been applied.
+    """
+
+    def __init__(
+        self,
+        backend,
+        consumer=None,
+        registry=None,
+        window=RESPONSE_FIREWALL_BATCH_WINDOW,
+        max_size=RESPONSE_FIREWALL_BATCH_MAX
+    ):
+        self.backend = backend
+        self.consumer = consumer
+        self.registry = registry
+        self.window = window
+        self.max_size = max_size
+        self.batches = {}
+        self.size = 0
+        self.oldest = None
+        self.ready = threading.Condition()
+        self.stats = {"batches": 0, "batched_tasks": 0, "max_batch": 0, "rejected": 0}
+        # Batches are applied one at a time, and flush() waits for them
+        self.apply_lock = threading.Lock()
+        self.flusher = threading.Thread(target=self._run_flusher, name="firewall-batcher", daemon=True)
+        self.flusher.start()
+
+    def accepts(self, task):
+        return task["action"]["name"] in FIREWALL_SETS
+
+    def add(self, task):
+        try:
+            element, ipv6 = firewall_element(task["params"])
+        except (KeyError, ValueError) as e:
+            log_event("error", f"Rejected firewall update {task['params']}: {str(e)}")
+            self.stats["rejected"] += 1
+            acknowledge(self.consumer, task["deliveries"])
+            return
+        
+        name = FIREWALL_SETS[task["action"]["name"]] + ("6" if ipv6 else "")
+        with self.ready:
+            if not self.size:
+                self.oldest = time.monotonic()
+            batch = self.batches.setdefault(name, {"action": task["action"], "elements": {}})
+            batch["elements"].setdefault(element, []).append(task)
+            self.size += 1
+            self.ready.notify()
+
+    def flush(self):
+        with self.ready:
+            batches = self._take_locked()
+        self._apply(batches)
+
+    def _take_locked(self):
+        batches = self.batches
+        self.batches = {}
+        self.size = 0
+        self.oldest = None
+        return batches
+
+    def _apply(self, batches):
+        with self.apply_lock:
+            for name, batch in batches.items():
+                self._apply_batch(name, batch)
+
+    def _apply_batch(self, name, batch):
+        action, elements = batch["action"], batch["elements"]
+        tasks = [task for queued in elements.values() for task in queued]
+        command = f"nft add element {RESPONSE_NFT_TABLE} {name} {{ {', '.join(elements)} }}"
+        self.stats["batches"] += 1
+        self.stats["batched_tasks"] += len(tasks)
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(elements))
+        try:
+            applied = run_response_command(action, command, self.backend, {
+                "batch_size": len(elements),
+                "batched_tasks": len(tasks),
+                "targets": list(elements)
+            })
+            if applied and self.registry is not None:
+                for element, queued in elements.items():
+                    for task in queued:
+                        self.registry.add(task, f"nft delete element {RESPONSE_NFT_TABLE} {name} {{ {element} }}")
+        except TimeoutError:
+            # Already logged; handled like any other failed action
+            pass
+        except Exception as e:
+            # This runs on the only batcher thread, which must keep going
+            log_event("error", f"Error applying firewall batch to {name}: {str(e)}")
+        finally:
+            # Failed acks are logged per entry and leave it pending
+            for task in tasks:
+                acknowledge(self.consumer, task["deliveries"])
+
+    def _run_flusher(self):
+        """
+        Background thread applying batches once their window has passed
+        """
+        while True:
+            with self.ready:
+                while True:
+                    if self.size >= self.max_size:
+                        break
+                    if self.size:
+                        remaining = self.oldest + self.window - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.ready.wait(remaining)
+                    else:
+                        self.ready.wait()
+                batches = self._take_locked()
+            self._apply(batches)
+
+def registry_key(task):
+    return "|".join(task["key"])
+
+class FileRegistryStore:
+    """
+    Registry persistence in a local JSON file, written atomically at most
+    every interval seconds and on shutdown
+    """
+
+    def __init__(self, path, interval=RESPONSE_REGISTRY_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.entries = {}
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        # Workers, the batcher and the expiry thread all update the registry
+        self.lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        return dict(self.entries)
+
+    def get(self, key):
+        # Only this agent writes the file, so it holds nothing we do not know
+        return None
+
+    def save(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self._changed()
+
+    def remove(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self._changed()
+        return True
+
+    def _changed(self):
+        self.dirty = True
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Atomically write the registry to disk
+        """
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.dirty:
+                return
+            try:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(self.entries, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except OSError as e:
+                print(f"Error writing response registry: {e}", file=sys.stderr)
+
+class RedisRegistryStore:
+    """
+    Registry persistence in a Redis hash shared by all response agents
+    """
+
+    def __init__(self, client, key=RESPONSE_REGISTRY_KEY):
+        self.client = client
+        self.key = key
+
+    def load(self):
+        return {
+            field.decode(): json.loads(value)
+            for field, value in self.client.hgetall(self.key).items()
+        }
+
+    def get(self, key):
+        value = self.client.hget(self.key, key)
+        return json.loads(value) if value else None
+
+    def save(self, key, entry):
+        self.client.hset(self.key, key, json.dumps(entry))
+
+    def remove(self, key):
+        # Only the agent whose delete succeeds reverts the action
+        return self.client.hdel(self.key, key) == 1
+
+class BlockRegistry:
+    """
+    Actions currently in effect, keyed by (action, target)
+
+    Membership is a dict lookup, so a repeated threat about an entity that
+    is already blocked is skipped without running anything. Each entry
+    carries the command that reverts it; a heap of expiry times drives a
+    background thread that runs those commands when entries expire. Entries
+    are persisted through the store and reloaded on start, and entries that
+    expired while the agent was down are reverted right away.
+    """
+
+    def __init__(self, backend, store=None, ttl=RESPONSE_BLOCK_TTL):
+        self.backend = backend
+        self.store = store
+        self.ttl = ttl
+        self.entries = {}
+        self.heap = []
+        self.ready = threading.Condition()
+        self.stats = {"registered": 0, "skipped": 0, "expired": 0}
+        
+        if store:
+            try:
+                persisted = store.load()
+            except Exception as e:
+                log_event("error", f"Error loading response registry: {str(e)}")
+                persisted = {}
+            with self.ready:
+                for key, entry in persisted.items():
+                    # One bad entry must not drop the rest
+                    try:
+                        self._insert(key, entry)
+                    except Exception as e:
+                        log_event("error", f"Error loading response registry entry {key}: {str(e)}")
+        self.expirer = threading.Thread(target=self._run_expiry, name="registry-expiry", daemon=True)
+        self.expirer.start()
+
+    def contains(self, task):
+        """
+        Whether the task's action is already in effect for its target
+        """
+        key = registry_key(task)
+        with self.ready:
+            if key in self.entries:
+                self.stats["skipped"] += 1
+                return True
+        if self.store:
+            # Another agent sharing the store may have acted on it
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                log_event("error", f"Error reading response registry: {str(e)}")
+                entry = None
+            if entry:
+                with self.ready:
+                    self._insert(key, entry)
+                    self.stats["skipped"] += 1
+                return True
+        return False
+
+    def add(self, task, revert_command):
+        """
+        Record that the task's action is in effect and how to revert it
+        """
+        key = registry_key(task)
+        entry = {
+            "action": task["action"]["name"],
+            "revert": revert_command,
+            "expires_at": time.time() + self.ttl if self.ttl else None
+        }
+        with self.ready:
+            self._insert(key, entry)
+            self.stats["registered"] += 1
+        if self.store:
+            try:
+                self.store.save(key, entry)
+            except Exception as e:
+                log_event("error", f"Error saving response registry: {str(e)}")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _insert(self, key, entry):
+        expires_at = entry["expires_at"]
+        self.entries[key] = entry
+        if expires_at is not None:
+            heapq.heappush(self.heap, (expires_at, key))
+            self.ready.notify()
+
+    def _run_expiry(self):
+        """
+        Background thread reverting actions whose time is up
+        """
+        while True:
+            with self.ready:
+                while True:
+                    # Skip heap entries replaced by a later registration
+                    while self.heap and self.entries.get(self.heap[0][1], {}).get("expires_at") != self.heap[0][0]:
+                        heapq.heappop(self.heap)
+                    if self.heap and self.heap[0][0] <= time.time():
+                        expires_at, key = heapq.heappop(self.heap)
+                        entry = self.entries[key]
+                        break
+                    self.ready.wait(self.heap[0][0] - time.time() if self.heap else None)
+            self._expire(key, entry)
+
+    def _expire(self, key, entry):
+        owner = True
+        if self.store:
+            try:
+                owner = self.store.remove(key)
+            except Exception as e:
+                log_event("error", f"Error updating response registry: {str(e)}")
+        if owner and entry["revert"]:
+            revert = {
+                "name": f"Revert {entry['action']}",
+                "description": f"Lift expired response action: {entry['action']}"
+            }
+            try:
+                run_response_command(revert, entry["revert"], self.backend, {"expired": key})
+            except TimeoutError:
+                pass
+        # Removed only now so the entity is not acted on again mid-revert
+        with self.ready:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+            self.stats["expired"] += 1
+
+class ResponseExecutor:
+    """
+    Runs response tasks on a thread pool, in parallel across targets and
+    serialized per target
+
+    A task whose target is busy waits in that target's backlog and runs on
+    the same worker once the current action finishes, so at most
+    concurrency tasks are taken from the queue at a time and the queue
+    keeps deciding what is most urgent.
+    """
+
+    def __init__(
+        self,
+        backend,
+        consumer=None,
+        concurrency=RESPONSE_CONCURRENCY,
+        on_start=None,
+        batcher=None,
+        registry=None
+    ):
+        self.backend = backend
+        self.consumer = consumer
+        self.on_start = on_start
+        self.batcher = batcher
+        self.registry = registry
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="response")
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.backlogs = {}
+        self.stats = {"started": 0, "succeeded": 0, "failed": 0, "timed_out": 0, "serialized": 0}
+
+    def dispatch(self, queue, timeout=None):
+        """
+        Wait for a free worker and hand it the most urgent queued task
+
+        Returns False if no task arrived within timeout.
+        """
+        self.slots.acquire()
+        task = queue.get(timeout)
+        if task is None:
+            self.slots.release()
+            return False
+        
+        if self.batcher and self.batcher.accepts(task):
+            # Firewall updates are applied by the batcher, not a worker
+            if not self._in_effect(task):
+                self._started(task)
+                self.batcher.add(task)
+            self.slots.release()
+            return True
+        
+        target = response_target(task["params"])
+        with self.lock:
+            if target in self.backlogs:
+                self.backlogs[target].append(task)
+                self.stats["serialized"] += 1
+                self.slots.release()
+                return True
+            self.backlogs[target] = deque()
+        self.pool.submit(self._run, target, task)
+        return True
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+        if self.batcher:
+            self.batcher.flush()
+
+    def _run(self, target, task):
+        drained = False
+        try:
+            while task:
+                try:
+                    self._execute(task)
+                except Exception as e:
+                    # A failing task must not wedge its target or the worker slot
+                    log_event("error", f"Error handling response task {task['action']['name']}: {str(e)}")
+                with self.lock:
+                    backlog = self.backlogs[target]
+                    if backlog:
+                        task = backlog.popleft()
+                    else:
+                        del self.backlogs[target]
+                        task = None
+            drained = True
+        finally:
+            if not drained:
+                with self.lock:
+                    self.backlogs.pop(target, None)
+            self.slots.release()
+
+    def _started(self, task):
+        with self.lock:
+            self.stats["started"] += 1
+        if self.on_start:
+            self.on_start(task, time.time() - task["detected_at"])
+
+    def _in_effect(self, task):
+        """
+        Skip and acknowledge a task whose action already stands for its target
+        """
+        if self.registry is not None and self.registry.contains(task):
+            acknowledge(self.consumer, task["deliveries"])
+            return True
+        return False
+
+    def _execute(self, task):
+        if self._in_effect(task):
+            return
+        self._started(task)
+        try:
+            outcome = "succeeded" if execute_response_action(task["action"], task["params"], self.backend) else "failed"
+            if outcome == "succeeded" and self.registry is not None:
+                revert = task["action"].get("revert")
+                self.registry.add(task, format_command({"command": revert}, task["params"]) if revert else None)
+        except TimeoutError:
+            outcome = "timed_out"
+        except Exception as e:
+            log_event("error", f"Error executing response action {task['action']['name']}: {str(e)}")
+            outcome = "failed"
+        with self.lock:
+            self.stats[outcome] += 1
+        # Acknowledge only once handled, so a crash means redelivery
+        acknowledge(self.consumer, task["deliveries"])
+
+def select_response_action(threat_context):
+    """
+    Choose the response action and its parameters for a threat context
     """
     if not threat_context:
         log_event("info", "No threat context available, skipping response")
-        return
+        return None
     
     # Determine appropriate action based on context
     suitable_actions = []
@@ -141,12 +953,11 @@ def execute_response_action(threat_context):
     elif "log" in threat_context and "message" in threat_context["log"]:
         log = threat_context["log"]
         
-        if "failed login" in log["message"].lower() and "user" in log["message"].lower():
-            # Extract username from message (simplified)
-            username = "compromised_user"  # In reality, would parse from log
+        if "failed login" in log["message"].lower() and log.get("user"):
+            # Username extracted by the log parser at ingest
             suitable_actions.append({
                 "action": RESPONSE_ACTIONS[2],  # Reset Compromised Credentials
-                "params": {"username": username}
+                "params": {"username": log["user"]}
             })
         
         elif "malware" in log["message"].lower():
@@ -164,17 +975,28 @@ def execute_response_action(threat_context):
             "params": {"source": "/var/critical", "backup_location": "/backup"}
         })
     
-    # Select an action (in reality, might use priority scoring)
-    selected = random.choice(suitable_actions)
-    action = selected["action"]
-    params = selected["params"]
-    
-    # Format command with parameters
+    # Candidates are listed in order of preference
+    selected = suitable_actions[0]
+    return selected["action"], selected["params"]
+
+def format_command(action, params):
+    """
+    Fill in an action's command template, quoting parameters so they cannot
+    inject arguments
+    """
     command = action["command"]
     for param, value in params.items():
-        command = command.replace(f"{{{param}}}", str(value))
-    
-    # Log the action being taken
+        command = command.replace(f"{{{param}}}", shlex.quote(str(value)))
+    return command
+
+def run_response_command(action, command, backend, metadata):
+    """
+    Run one response command through a backend, logging and sharing the
+    outcome
+
+    Returns True if the command succeeded; a TimeoutError is re-raised after
+    it has been logged.
+    """
     log_event(
         "info", 
         f"Taking automated response: {action['name']} - {command}",
@@ -182,62 +1004,237 @@ def execute_response_action(threat_context):
             "action": action["name"],
             "description": action["description"],
             "command": command,
-            "params": params
+            **metadata
         }
     )
     
-    # Simulate execution delay
-    time.sleep(random.uniform(0.5, 2.0))
+    timeout = action.get("timeout", RESPONSE_ACTION_TIMEOUT)
+    error = None
+    try:
+        backend.run(command, timeout)
+    except Exception as e:
+        error = e
     
-    # Log successful execution (in reality, would check command result)
-    log_event(
-        "success", 
-        f"Successfully executed response action: {action['name']}",
-        {"command": command}
-    )
+    if error is None:
+        log_event(
+            "success", 
+            f"Successfully executed response action: {action['name']}",
+            {"command": command}
+        )
+    else:
+        log_event(
+            "error",
+            f"Response action {action['name']} failed: {str(error)}",
+            {"command": command, "timeout": timeout}
+        )
     
     # Share response context with MCP
-    if redis_client:
-        try:
-            response_data = {
-                "action": action["name"],
-                "command": command,
-                "timestamp": datetime.now().isoformat(),
-                "successful": True
-            }
-            redis_client.set(f"mcp:context:response:{action['name']}", json.dumps(response_data))
-            redis_client.publish("mcp:response:actions", json.dumps(response_data))
-        except Exception as e:
-            log_event("error", f"Error sharing response context with MCP: {str(e)}")
+    if mcp_writer:
+        response_data = {
+            "action": action["name"],
+            "command": command,
+            "timestamp": datetime.now().isoformat(),
+            "successful": error is None
+        }
+        mcp_writer.share(f"mcp:context:response:{action['name']}", "mcp:response:actions", response_data)
+    
+    if isinstance(error, TimeoutError):
+        raise error
+    return error is None
+
+def execute_response_action(action, params, backend):
+    """
+    Execute a response action with its parameters through a backend
+    """
+    return run_response_command(action, format_command(action, params), backend, {"params": params})
 
-def response_agent_loop():
+def response_agent_loop(backend_name=RESPONSE_BACKEND, firewall_batching=RESPONSE_FIREWALL_BATCHING):
     """
     Main response agent loop
     """
     log_event("info", f"Response agent started - Agent {AGENT_NAME} (ID: {AGENT_ID})")
     
     try:
-        while True:
-            # Get threat context from MCP
-            threat_context = get_threat_context()
-            
-            # Execute response if threat context exists
-            if threat_context:
-                execute_response_action(threat_context)
-            else:
+        if not threat_consumer:
+            # Without MCP there is no threat context to respond to
+            while True:
                 log_event("info", "No active threats requiring response")
-            
-            # Sleep between 45-75 seconds to wait for new threats
-            wait_time = random.randint(45, 75)
-            time.sleep(wait_time)
-            
+                output_writer.flush()
+                time.sleep(random.randint(45, 75))
+        
+        if backend_name not in RESPONSE_BACKENDS:
+            log_event("error", f"Unknown response backend {backend_name}, using simulated")
+            backend_name = "simulated"
+        backend = RESPONSE_BACKENDS[backend_name]()
+        if RESPONSE_REGISTRY_STORE == "file":
+            store = FileRegistryStore(RESPONSE_REGISTRY_FILE)
+        else:
+            store = RedisRegistryStore(redis_client)
+        registry = BlockRegistry(backend, store)
+        log_event("info", f"Response registry loaded with {len(registry)} action(s) in effect")
+        batcher = FirewallBatcher(backend, threat_consumer, registry) if firewall_batching else None
+        executor = ResponseExecutor(backend, threat_consumer, batcher=batcher, registry=registry)
+        threat_queue = ThreatQueue()
+        start_ingest(threat_consumer, threat_queue)
+        while True:
+            executor.dispatch(threat_queue)
+            if not threat_queue:
+                output_writer.flush()
+    
     except Exception as e:
         log_event("critical", f"Error in response agent: {str(e)}")
         raise
 
+def benchmark_latency(count, rate):
+    """
+    Measure detection-to-action latency for count synthetic threats published
+    at rate per second, with actions sent to the dry-run backend
+
+    With Redis the threats travel the full MCP path (batched writer, stream,
+    consumer group) on a dedicated benchmark stream; without it they are fed
+    straight into the local queue.
+    """
+    if redis_client:
+        channel = "mcp:benchmark:threats"
+        # Start from a fresh group so leftovers of earlier runs are not replayed
+        try:
+            redis_client.xgroup_destroy(stream_for_channel(channel), "response-benchmark")
+        except Exception:
+            pass
+        consumer = StreamConsumer(
+            redis_client,
+            [stream_for_channel(channel)],
+            "response-benchmark",
+            RESPONSE_CONSUMER,
+            start_id="$"
+        )
+        writer = MCPWriter(redis_client, ttl=60)
+    else:
+        consumer = None
+    threat_queue = ThreatQueue()
+    if consumer:
+        start_ingest(consumer, threat_queue)
+    
+    def produce():
+        severities = list(SEVERITY_RANK)
+        for i in range(count):
+            threat_context = {
+                "event": {"type": "connection", "source": f"198.18.{i // 254 % 256}.{i % 254 + 1}", "port": 22},
+                "threat_level": severities[i % len(severities)],
+                "timestamp": datetime.now().isoformat()
+            }
+            if consumer:
+                writer.share("mcp:context:benchmark", channel, threat_context)
+            else:
+                threat_queue.put(response_task(threat_context))
+            time.sleep(1 / rate)
+    
+    latencies = []
+    executor = ResponseExecutor(
+        DryRunBackend(),
+        consumer,
+        on_start=lambda task, latency: latencies.append(latency * 1000)
+    )
+    threading.Thread(target=produce, name="benchmark-producer", daemon=True).start()
+    dispatched = 0
+    while dispatched < count and executor.dispatch(threat_queue, timeout=10):
+        dispatched += 1
+    executor.shutdown()
+    
+    if not latencies:
+        log_event("error", "Latency benchmark received no threats")
+        return None
+    latencies.sort()
+    
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3)
+    results = {
+        "transport": "redis-streams" if consumer else "local-queue",
+        "threats": len(latencies),
+        "rate": rate,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1], 3),
+        "target_ms": RESPONSE_LATENCY_TARGET_MS
+    }
+    within_target = results["p99_ms"] < RESPONSE_LATENCY_TARGET_MS
+    log_event(
+        "info" if within_target else "warning",
+        f"Detection-to-action latency over {results['threats']} threats: "
+        f"p50 {results['p50_ms']} ms, p99 {results['p99_ms']} ms "
+        f"({'within' if within_target else 'above'} {RESPONSE_LATENCY_TARGET_MS:g} ms target)",
+        results
+    )
+    return results
+
+def benchmark_throughput(count, action_latency, concurrency=RESPONSE_CONCURRENCY, firewall_batching=False):
+    """
+    Time a burst of count threats through the executor with the dry-run
+    backend taking action_latency seconds per command
+
+    Every tenth threat targets the same host as the one before it, so
+    per-target serialization is exercised as well.
+    """
+    backend = DryRunBackend(latency=action_latency)
+    batcher = FirewallBatcher(backend) if firewall_batching else None
+    executor = ResponseExecutor(backend, concurrency=concurrency, batcher=batcher)
+    threat_queue = ThreatQueue(max_size=count)
+    for i in range(count):
+        host = f"198.18.{i // 254 % 256}.{i % 254 + 1}"
+        if i % 10 == 9:
+            event = {"type": "traffic", "destination": previous, "port": 4444}
+        else:
+            event = {"type": "connection", "source": host}
+            previous = host
+        threat_queue.put(response_task({"event": event, "threat_level": "high", "timestamp": datetime.now().isoformat()}))
+    
+    started = time.perf_counter()
+    while executor.dispatch(threat_queue, timeout=0):
+        pass
+    executor.shutdown()
+    elapsed = time.perf_counter() - started
+    
+    actions = executor.stats["started"]
+    results = {
+        "actions": actions,
+        "commands": len(backend.commands),
+        "concurrency": concurrency,
+        "action_latency_s": action_latency,
+        "seconds": round(elapsed, 3),
+        "actions_per_second": round(actions / elapsed, 1),
+        "serial_seconds": round(actions * action_latency, 3),
+        "executor": dict(executor.stats)
+    }
+    if batcher:
+        results["firewall_batches"] = dict(batcher.stats)
+    log_event(
+        "info",
+        f"Executed {actions} actions as {results['commands']} commands in {results['seconds']}s "
+        f"({results['actions_per_second']}/s with concurrency {concurrency}, "
+        f"{results['serial_seconds']}s if run one at a time)",
+        results
+    )
+    return results
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ATRO-Lite response agent")
+    parser.add_argument("--backend", choices=sorted(RESPONSE_BACKENDS), default=RESPONSE_BACKEND, help="how response actions are carried out")
+    parser.add_argument("--firewall-batching", action="store_true", default=RESPONSE_FIREWALL_BATCHING, help="apply firewall blocks as batched nft set updates")
+    parser.add_argument("--benchmark", type=int, metavar="COUNT", help="measure detection-to-action latency over COUNT synthetic threats")
+    parser.add_argument("--rate", type=float, default=200, help="threats per second published by the benchmark")
+    parser.add_argument("--throughput", type=int, metavar="COUNT", help="measure executor throughput over a burst of COUNT threats")
+    parser.add_argument("--action-latency", type=float, default=0.05, help="seconds per dry-run action for --throughput")
+    parser.add_argument("--concurrency", type=int, default=RESPONSE_CONCURRENCY, help="parallel actions for --throughput")
+    args = parser.parse_args()
+    
     try:
-        response_agent_loop()
+        if args.benchmark:
+            benchmark_latency(args.benchmark, args.rate)
+        elif args.throughput:
+            benchmark_throughput(args.throughput, args.action_latency, args.concurrency, args.firewall_batching)
+        else:
+            response_agent_loop(args.backend, args.firewall_batching)
     except KeyboardInterrupt:
         print("Response agent stopped")
     except Exception as e: